@@ -0,0 +1,209 @@
+import gzip
+import itertools
+import logging
+import time
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Returns the content coding to use for an Accept-Encoding header, brotli
+    when it is installed and weighted at least as high as gzip, or None.
+    """
+    weights = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        weight = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in ("br", "gzip") if brotli else ("gzip",):
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class StreamCompressor:
+    """
+    Incremental gzip or brotli compressor. Every chunk is flushed, so the
+    client can decode the stream as it arrives. Keeps the byte counts and
+    CPU time spent for the metrics.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(
+                mode=brotli.MODE_TEXT,
+                quality=getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5),
+            )
+        else:
+            self.compressor = zlib.compressobj(
+                getattr(settings, "COMPRESSION_GZIP_LEVEL", 6), zlib.DEFLATED, 31
+            )
+        self.raw_size = 0
+        self.compressed_size = 0
+        self.cpu_time = 0.0
+
+    def compress(self, chunk):
+        start = time.thread_time()
+        if self.encoding == "br":
+            ret = self.compressor.process(chunk) + self.compressor.flush()
+        else:
+            ret = self.compressor.compress(chunk) + self.compressor.flush(
+                zlib.Z_SYNC_FLUSH
+            )
+        self.cpu_time += time.thread_time() - start
+        self.raw_size += len(chunk)
+        self.compressed_size += len(ret)
+        return ret
+
+    def finish(self):
+        start = time.thread_time()
+        if self.encoding == "br":
+            ret = self.compressor.finish()
+        else:
+            ret = self.compressor.flush()
+        self.cpu_time += time.thread_time() - start
+        self.compressed_size += len(ret)
+        return ret
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(
+            content,
+            mode=brotli.MODE_TEXT,
+            quality=getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5),
+        )
+    return gzip.compress(
+        content, compresslevel=getattr(settings, "COMPRESSION_GZIP_LEVEL", 6), mtime=0
+    )
+
+
+def log_compression(request, encoding, raw_size, compressed_size, cpu_time):
+    logger.info(
+        "%s %s: %s %d -> %d bytes (%.1fx) in %.2f ms CPU",
+        request.method,
+        request.path,
+        encoding,
+        raw_size,
+        compressed_size,
+        raw_size / compressed_size if compressed_size else 0,
+        cpu_time * 1000,
+        extra={
+            "path": request.path,
+            "encoding": encoding,
+            "raw_size": raw_size,
+            "compressed_size": compressed_size,
+            "cpu_time": cpu_time,
+        },
+    )
+
+
+class CompressionMiddleware:
+    """
+    Compresses text and JSON responses with brotli or gzip, whichever the
+    client prefers. Responses below COMPRESSION_MIN_SIZE are left alone, for
+    streaming responses the first chunks are read ahead to tell. Streaming
+    responses are then compressed chunk by chunk as they are sent. The
+    size, ratio and CPU time of each compressed response are logged at INFO
+    on LJConnect.middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        content_types = getattr(
+            settings, "COMPRESSION_CONTENT_TYPES", ("application/json", "text/")
+        )
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if response.has_header("Content-Encoding") or not content_type.startswith(
+            tuple(content_types)
+        ):
+            return response
+
+        min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+        if response.streaming:
+            head, rest = self.read_ahead(response.streaming_content, min_size)
+            response.streaming_content = itertools.chain(head, rest)
+            if sum(map(len, head)) < min_size:
+                return response
+        elif len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                request, response.streaming_content, encoding
+            )
+            del response.headers["Content-Length"]
+        else:
+            start = time.thread_time()
+            compressed = compress(response.content, encoding)
+            cpu_time = time.thread_time() - start
+            # Not worth it, e.g. content that is compressed already
+            if len(compressed) >= len(response.content):
+                return response
+            log_compression(
+                request, encoding, len(response.content), len(compressed), cpu_time
+            )
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The representation changed, a strong ETag would no longer hold
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def read_ahead(self, chunks, size):
+        """Returns the first chunks adding up to size bytes and the rest."""
+        chunks = iter(chunks)
+        head = []
+        read = 0
+        for chunk in chunks:
+            head.append(chunk)
+            read += len(chunk)
+            if read >= size:
+                break
+        return head, chunks
+
+    def compress_stream(self, request, chunks, encoding):
+        compressor = StreamCompressor(encoding)
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+        log_compression(
+            request,
+            encoding,
+            compressor.raw_size,
+            compressor.compressed_size,
+            compressor.cpu_time,
+        )
@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Additional installed packages
     "decouple",
     # Created apps
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "LJConnect.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -81,6 +83,27 @@ DATABASES = {
     }
 }
 
+# Shared cache for the table version counters behind the API ETags and the
+# response cache, Redis is required for both. Without REDIS_URL every process
+# keeps its own counters, so ETags and cached responses are turned off unless
+# CACHE_IS_SHARED says the process is alone, e.g. a development server.
+if config("REDIS_URL", default=""):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": config("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# None guesses from the backend, only LocMemCache and DummyCache are private
+CACHE_IS_SHARED = None
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -120,16 +143,71 @@ USE_L10N = False
 # Rest framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication",
-    )
+        "authentication.authentication_classes.CachedJWTStatelessUserAuthentication",
+    ),
+    # orjson-backed JSON, byte-identical to DRF's and falling back to the
+    # stdlib json module when orjson is not installed
+    "DEFAULT_RENDERER_CLASSES": (
+        "api_gateway.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "api_gateway.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
+# Keyset pagination of the api_gateway list endpoints (opt-in with ?page_size= or ?cursor=)
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+# Rows fetched and rendered per chunk by the streaming list responses
+API_STREAM_CHUNK_SIZE = 500
+
+# /api/v1/search/: shortest accepted query, default and largest page size and
+# how deep the ranked results can be paged
+SEARCH_MIN_LENGTH = 3
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_MAX_RESULTS = 200
+
+# /api/v1/sync/: seconds consecutive polls overlap by, covering rows saved in
+# transactions that committed after the previous poll, and seconds tombstones
+# are kept; clients with older tokens get a full resync. Rows are stamped when
+# saved, not when committed, so the overlap must exceed the longest transaction
+# writing synced records, or its rows are missed. The longest are bulk student
+# imports, which take seconds per ten thousand rows: split larger files or
+# raise the overlap.
+SYNC_TOKEN_OVERLAP = config("SYNC_TOKEN_OVERLAP", default=60, cast=int)
+SYNC_TOMBSTONE_RETENTION = 60 * 60 * 24 * 90
+
+# Student imports (/api/v1/student/import/, manage.py import_students): rows
+# validated and created per bulk_create()
+STUDENT_IMPORT_BATCH_SIZE = 1000
+
+# Bulk PUT of staff and students: most records per request, and per
+# bulk_create() / bulk_update() query
+BULK_UPSERT_MAX_ROWS = 5000
+BULK_UPSERT_BATCH_SIZE = 1000
+
+# Seconds a rendered compact listing stays cached; entries are keyed by table
+# version, so this only bounds how long superseded entries linger
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Response compression, brotli is preferred when the optional brotli package
+# is installed. Ratios and CPU times are logged at INFO on LJConnect.middleware
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_CONTENT_TYPES = ("application/json", "text/")
+
 # dj-rest-auth
 REST_AUTH = {
     "SESSION_LOGIN": False,
     "USE_JWT": True,
     "JWT_AUTH_COOKIE": "jwt-auth",
     "JWT_AUTH_HTTPONLY": False,
+    "JWT_TOKEN_CLAIMS_SERIALIZER": "authentication.serializers.RoleTokenObtainPairSerializer",
 }
 
 # simple-jwt configurations
@@ -139,8 +217,19 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=15),
     "BLACKLIST_AFTER_ROTATION": True,
     "LEEWAY": 10,  # seconds
+    "TOKEN_REFRESH_SERIALIZER": "authentication.serializers.RoleTokenRefreshSerializer",
 }
 
+# Number of verified access tokens kept in the per-process LRU
+JWT_TOKEN_CACHE_SIZE = 1024
+
+# Queue department permission recomputation for `manage.py run_permission_worker`
+# instead of running it inside the request
+PERMISSION_JOBS_ASYNC = config("PERMISSION_JOBS_ASYNC", default=False, cast=bool)
+
+# Seconds a user's profile payload is cached for
+PROFILE_CACHE_TIMEOUT = 60
+
 # Social authentication settings
 SOCIALACCOUNT_PROVIDERS = {
     "google": {
@@ -0,0 +1,278 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.validators import (
+    BaseUniqueForValidator,
+    UniqueTogetherValidator,
+    UniqueValidator,
+)
+
+from authentication.claims import bump_authorization_version
+from authentication.profile import invalidate_profiles
+from data.signals import AUTHORIZATION_FIELDS, authorization_emails
+from data.versions import bump_model_versions
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that finds the related rows in
+    context["preloaded"][field_name], loaded once for every row being
+    validated, rather than querying for each row.
+    """
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        instance = self.context["preloaded"][self.field_name].get(pk)
+        if instance is None:
+            self.fail("does_not_exist", pk_value=data)
+        return instance
+
+
+@lru_cache(maxsize=None)
+def bulk_serializer(serializer_class):
+    """
+    Returns a subclass of the ModelSerializer serializer_class whose
+    validation runs no queries: the unique validators are dropped, see
+    bulk_upsert() for how uniqueness is checked instead, and related primary
+    keys are looked up with PreloadedPrimaryKeyRelatedField. Writable
+    many-to-many and nested fields aren't supported.
+    """
+
+    class BulkSerializer(serializer_class):
+        def get_fields(self):
+            fields = super().get_fields()
+            for name, field in fields.items():
+                if field.read_only:
+                    continue
+                if isinstance(
+                    field, (serializers.ManyRelatedField, serializers.BaseSerializer)
+                ):
+                    raise ImproperlyConfigured(
+                        f"{serializer_class.__name__}.{name} can't be written in bulk."
+                    )
+                if isinstance(field, serializers.PrimaryKeyRelatedField):
+                    field = fields[name] = PreloadedPrimaryKeyRelatedField(
+                        *field._args, **field._kwargs
+                    )
+                field.validators = [
+                    validator
+                    for validator in field.validators
+                    if not isinstance(validator, UniqueValidator)
+                ]
+            return fields
+
+        def get_validators(self):
+            return [
+                validator
+                for validator in super().get_validators()
+                if not isinstance(
+                    validator, (UniqueTogetherValidator, BaseUniqueForValidator)
+                )
+            ]
+
+    BulkSerializer.__name__ = f"Bulk{serializer_class.__name__}"
+    return BulkSerializer
+
+
+def preload_related(serializer, rows):
+    """
+    Loads the rows referenced by the PreloadedPrimaryKeyRelatedFields of
+    serializer in rows, one query per field.
+    """
+    preloaded = {}
+    for name, field in serializer.fields.items():
+        if not isinstance(field, PreloadedPrimaryKeyRelatedField):
+            continue
+        queryset = field.get_queryset()
+        pks = set()
+        for row in rows:
+            try:
+                pks.add(queryset.model._meta.pk.to_python(row[name]))
+            except (KeyError, TypeError, ValueError, DjangoValidationError):
+                pass
+        preloaded[name] = queryset.in_bulk(pks) if pks else {}
+    return preloaded
+
+
+def bulk_upsert(serializer_class, rows):
+    """
+    Writes rows, a list of records in the format of the ModelSerializer
+    serializer_class, matched to existing records by primary key. Those are
+    updated with just the fields given, like PATCH, and the rest are created.
+    Nothing is written unless every row is valid, a ValidationError carries
+    the errors of each row otherwise. Returns the number of records created
+    and updated.
+
+    Uniqueness and related keys are checked for all rows at once, and the
+    records written with bulk_create(), so the number of queries doesn't grow
+    with the rows. As those send no signals, the update timestamps, table
+    version and authorization versions are bumped, and the cached profiles
+    invalidated, here.
+    Must be called in a transaction.
+    """
+    context = {}
+    serializer = bulk_serializer(serializer_class)(context=context)
+    model = serializer.Meta.model
+    pk = model._meta.pk
+    batch_size = getattr(settings, "BULK_UPSERT_BATCH_SIZE", 1000)
+
+    keys = []
+    for row in rows:
+        try:
+            keys.append(pk.to_python(row[pk.name]))
+        except (KeyError, TypeError, ValueError, DjangoValidationError):
+            keys.append(None)
+    existing = model.objects.select_for_update().in_bulk(
+        {key for key in keys if key is not None}
+    )
+    context["preloaded"] = preload_related(
+        serializer, [row for row in rows if isinstance(row, dict)]
+    )
+
+    errors = []
+    validated = []
+    seen = set()
+    for index, (row, key) in enumerate(zip(rows, keys)):
+        instance = existing.get(key)
+        serializer.instance = instance
+        serializer.partial = instance is not None
+        try:
+            if key is not None and key in seen:
+                raise serializers.ValidationError({pk.name: ["Listed more than once."]})
+            data = serializer.run_validation(row)
+        except serializers.ValidationError as e:
+            errors.append(serializers.as_serializer_error(e))
+            continue
+        seen.add(key)
+        errors.append({})
+        validated.append((index, instance, data))
+
+    for field in model._meta.concrete_fields:
+        if field.unique and not field.primary_key and field.name in serializer.fields:
+            check_unique(field, validated, errors)
+
+    if any(errors):
+        raise serializers.ValidationError(errors)
+
+    now = timezone.now()
+    created = []
+    updated = []
+    update_fields = set()
+    emails = set()
+    tracked_fields = AUTHORIZATION_FIELDS.get(model, ())
+    for _, instance, data in validated:
+        if instance is None:
+            instance = model(**data)
+            created.append(instance)
+            if tracked_fields:
+                emails |= authorization_emails(instance)
+            continue
+
+        for name, value in data.items():
+            setattr(instance, name, value)
+        instance.update_timestamp = now
+        updated.append(instance)
+        update_fields.update(data)
+
+        if tracked_fields:
+            old_values = instance.get_loaded_values(tracked_fields)
+            if any(
+                old_values[name] != getattr(instance, name) for name in tracked_fields
+            ):
+                emails |= authorization_emails(instance, old_values)
+
+    update_fields.discard(pk.name)
+    model.objects.bulk_create(created, batch_size=batch_size)
+    if updated:
+        update_fields = [*sorted(update_fields), "update_timestamp"]
+        if connection.features.supports_update_conflicts_with_target:
+            # The instances hold whole rows, so an INSERT ... ON CONFLICT DO
+            # UPDATE writes them without bulk_update()'s CASE per row and field
+            model.objects.bulk_create(
+                updated,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=[pk.name],
+                update_fields=update_fields,
+            )
+        else:
+            model.objects.bulk_update(updated, update_fields, batch_size=batch_size)
+
+    if created or updated:
+        bump_model_versions(model)
+    bump_authorization_version(emails)
+    invalidate_profiles(emails)
+    return {"created": len(created), "updated": len(updated)}
+
+
+def check_unique(field, validated, errors):
+    """
+    Adds an error to the rows of validated that set the unique field to a
+    value held by another record, or by an earlier row.
+    """
+    message = field.error_messages["unique"] % {
+        "model_name": field.model._meta.verbose_name,
+        "field_label": field.verbose_name,
+    }
+    claims = {}
+    for index, instance, data in validated:
+        if field.name in data:
+            key = instance.pk if instance else data[field.model._meta.pk.name]
+            claims.setdefault(data[field.name], []).append((index, key))
+
+    owners = dict(
+        field.model.objects.filter(**{f"{field.name}__in": claims}).values_list(
+            field.name, "pk"
+        )
+    )
+    for value, rows in claims.items():
+        for position, (index, key) in enumerate(rows):
+            if position or owners.get(value, key) != key:
+                errors[index][field.name] = [message]
+
+
+class BulkUpsertMixin:
+    """
+    Bulk mode for PUT endpoints: views call bulk_upsert_response() when the
+    body is a list of records. See bulk_upsert().
+    """
+
+    def bulk_upsert_response(self, rows, serializer_class):
+        max_rows = getattr(settings, "BULK_UPSERT_MAX_ROWS", 5000)
+        if len(rows) > max_rows:
+            return Response(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        f"Ensure this list has no more than {max_rows} elements."
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            with transaction.atomic():
+                report = bulk_upsert(serializer_class, rows)
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # Another request wrote a conflicting record in the meantime
+            return Response(
+                {"detail": "The records changed while being written, retry."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(report, status=status.HTTP_200_OK)
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import math
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from authentication.principal import get_principal
+from data.versions import cache_is_shared, get_model_versions
+
+
+def get_request_versions(request, models):
+    """
+    Returns get_model_versions(*models), read from the cache at most once per
+    request.
+    """
+    http_request = getattr(request, "_request", request)
+    if not hasattr(http_request, "_model_versions"):
+        http_request._model_versions = {}
+    if models not in http_request._model_versions:
+        http_request._model_versions[models] = get_model_versions(*models)
+    return http_request._model_versions[models]
+
+
+def versioned(*models):
+    """
+    Decorates a GET handler with a weak ETag and Last-Modified derived from
+    the version counters of models. Conditional requests are answered with
+    304 before the handler, and therefore any serializer, runs. The ETag is
+    scoped to the user, path, query string and Accept header since the same
+    URL renders differently for each of them. Without a shared cache the
+    counters can't be trusted and the handler runs as if undecorated.
+    """
+
+    def validators(request):
+        http_request = getattr(request, "_request", request)
+        if not hasattr(http_request, "_validators"):
+            versions, modified = get_request_versions(request, models)
+            principal = get_principal(request)
+            scope = [
+                request.path,
+                request.META.get("QUERY_STRING", ""),
+                request.META.get("HTTP_ACCEPT", ""),
+                principal.email if principal else None,
+                versions,
+            ]
+            digest = hashlib.sha1(json.dumps(scope, sort_keys=True).encode())
+            # Last-Modified has whole-second precision, round up so a change
+            # later in the same second still moves it forward
+            last_modified = datetime.fromtimestamp(math.ceil(modified), timezone.utc)
+            http_request._validators = (f'W/"{digest.hexdigest()}"', last_modified)
+        return http_request._validators
+
+    conditional = method_decorator(
+        condition(
+            etag_func=lambda request, *args, **kwargs: validators(request)[0],
+            last_modified_func=lambda request, *args, **kwargs: validators(request)[1],
+        )
+    )
+
+    def decorator(handler):
+        conditional_handler = conditional(handler)
+
+        @wraps(handler)
+        def wrapped(self, request, *args, **kwargs):
+            if not cache_is_shared():
+                return handler(self, request, *args, **kwargs)
+            response = conditional_handler(self, request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapped
+
+    return decorator
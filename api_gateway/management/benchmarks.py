@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from datetime import date
+
+from django.core.management.base import CommandError
+from django.db import transaction
+
+from data.models import Branch, StudentDetail
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Runs the block in a transaction that is rolled back afterwards."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def create_students(rows, first_name=lambda: "fname", last_name=lambda: "lname"):
+    """
+    Creates rows synthetic students in the first branch, named by calling
+    first_name and last_name. Their enrolment numbers start with a 9.
+    """
+    branch = Branch.objects.first()
+    if branch is None:
+        raise CommandError("At least one branch is required.")
+
+    StudentDetail.objects.bulk_create(
+        [
+            StudentDetail(
+                enrolment_no=f"9{number:011}",
+                email=f"9{number:011}@ljku.edu.in",
+                first_name=first_name(),
+                last_name=last_name(),
+                gender="M",
+                birth_date=date(2004, 1, 1),
+                mobile_number="+911234567890",
+                branch=branch,
+            )
+            for number in range(rows)
+        ],
+        batch_size=1000,
+    )
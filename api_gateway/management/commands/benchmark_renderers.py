@@ -0,0 +1,74 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api_gateway.renderers import ORJSONRenderer, orjson
+from api_gateway.serializers import StudentDetailBranchSerializer
+from data.models import Branch, StudentDetail
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares DRF's JSONRenderer with ORJSONRenderer on a synthetic "
+        "student listing. Nothing is written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=10000,
+            help="Number of synthetic students to render.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Runs per renderer, the fastest one is reported.",
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson is not installed, both renderers use json.")
+
+        branch = Branch(
+            branch_code="BENCH",
+            branch_short_name="BENCH",
+            branch_full_name="Benchmark Branch",
+        )
+        students = [
+            StudentDetail(
+                enrolment_no=f"9{number:011}",
+                email=f"9{number:011}@ljku.edu.in",
+                first_name="fname",
+                middle_name="mname" if number % 2 else None,
+                last_name="lname",
+                gender="M",
+                birth_date=date(2004, 1, 1),
+                mobile_number="+911234567890",
+                branch=branch,
+            )
+            for number in range(options["rows"])
+        ]
+        data = StudentDetailBranchSerializer(students, many=True).data
+
+        timings = {}
+        for name, renderer in (
+            ("json", JSONRenderer()),
+            ("orjson", ORJSONRenderer()),
+        ):
+            timings[name] = min(
+                self.time(renderer.render, data) for _ in range(options["repeat"])
+            )
+            self.stdout.write(
+                f"{name}: {timings[name] * 1000:.1f} ms, "
+                f"{options['rows'] / timings[name]:,.0f} rows/s"
+            )
+        self.stdout.write(f"speedup: {timings['json'] / timings['orjson']:.1f}x")
+
+    def time(self, render, data):
+        start = time.perf_counter()
+        render(data)
+        return time.perf_counter() - start
@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api_gateway.management.benchmarks import create_students, rolled_back
+from api_gateway.search import search
+
+SYLLABLES = ("ha", "rsh", "do", "ba", "ri", "ya", "pa", "tel", "me", "hta", "sh", "ah")
+
+
+class Command(BaseCommand):
+    help = (
+        "Times /api/v1/search/ queries over synthetic students and prints the "
+        "latency percentiles. The students are created in a transaction that "
+        "is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=50000,
+            help="Number of synthetic students to search.",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=200,
+            help="Number of queries to time.",
+        )
+
+    def handle(self, *args, **options):
+        names = random.Random(0)
+
+        def name():
+            return "".join(names.choice(SYLLABLES) for _ in range(3)).capitalize()
+
+        with rolled_back():
+            create_students(options["rows"], first_name=name, last_name=name)
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE data_studentdetail")
+            self.run_queries(
+                [name()[: names.randint(3, 7)] for _ in range(options["queries"])]
+            )
+
+    def run_queries(self, queries):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query, 0, 20)
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        self.stdout.write(f"{connection.vendor}, {len(timings)} queries")
+        for percentile in (50, 95, 99):
+            index = min(len(timings) - 1, len(timings) * percentile // 100)
+            self.stdout.write(f"p{percentile}: {timings[index] * 1000:.1f} ms")
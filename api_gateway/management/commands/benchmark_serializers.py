@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_gateway.management.benchmarks import create_students, rolled_back
+from api_gateway.serializers import StudentDetailSupportSerializer, values_serializer
+from data.models import StudentDetail
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the DRF serializer with the .values() read path on the "
+        "compact student listing. The synthetic students are created in a "
+        "transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=10000,
+            help="Number of synthetic students to serialize.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Runs per read path, the fastest one is reported.",
+        )
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            create_students(options["rows"])
+            self.compare(options["repeat"])
+
+    def compare(self, repeat):
+        queryset = StudentDetail.objects.filter(graduated=False)
+        rows = queryset.count()
+
+        def drf():
+            serializer = StudentDetailSupportSerializer(
+                queryset.select_related("branch"), many=True
+            )
+            return serializer.data
+
+        def values():
+            return values_serializer(StudentDetailSupportSerializer).serialize(queryset)
+
+        timings = {}
+        for name, read in (("serializer", drf), ("values", values)):
+            timings[name] = min(self.time(read) for _ in range(repeat))
+            self.stdout.write(
+                f"{name}: {timings[name] * 1000:.1f} ms, "
+                f"{rows / timings[name]:,.0f} rows/s"
+            )
+        self.stdout.write(f"speedup: {timings['serializer'] / timings['values']:.1f}x")
+
+    def time(self, read):
+        start = time.perf_counter()
+        read()
+        return time.perf_counter() - start
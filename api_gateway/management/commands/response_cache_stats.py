@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api_gateway.response_cache import get_response_cache_stats
+from data.versions import cache_is_shared
+
+
+class Command(BaseCommand):
+    help = "Prints the hit and miss counters of the cached API endpoints."
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            # The counters would be this process's own, i.e. always zero
+            raise CommandError(
+                "Response caching is off, it needs a shared cache such as Redis "
+                "(REDIS_URL)."
+            )
+
+        for endpoint, stats in sorted(get_response_cache_stats().items()):
+            total = stats["hits"] + stats["misses"]
+            ratio = stats["hits"] / total if total else 0
+            self.stdout.write(
+                f"{endpoint}: {stats['hits']} hits, {stats['misses']} misses "
+                f"({ratio:.0%} hit rate)"
+            )
@@ -0,0 +1,92 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+from .serializers import SparseFieldsetMixin
+from .streaming import streaming_list_response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the model's primary key. Each page is a
+    `pk > last seen pk` range query, so deep pages cost the same as the first
+    one. Cursors are opaque and only `next`/`previous` links are returned.
+    """
+
+    ordering = "pk"
+    page_size = getattr(settings, "API_PAGE_SIZE", 100)
+    page_size_query_param = "page_size"
+    max_page_size = getattr(settings, "API_MAX_PAGE_SIZE", 1000)
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+
+class KeysetPaginationMixin:
+    """
+    Opt-in pagination for list endpoints: clients that send `cursor` or
+    `page_size` get a `{"next", "previous", "results"}` page, everyone else
+    keeps receiving the full list. Views with `stream_list` set stream that
+    full list row by row instead of rendering it in one go. Serializers with
+    SparseFieldsetMixin also honour `?fields=a,b,c`.
+    """
+
+    pagination_class = KeysetPagination
+    stream_list = False
+
+    def list_response(self, queryset, serializer_class):
+        serializer_kwargs = {}
+        fields = self.request.query_params.get("fields")
+        if fields and issubclass(serializer_class, SparseFieldsetMixin):
+            serializer_kwargs["fields"] = serializer_class.parse_fields(fields)
+            queryset = serializer_class.narrow_queryset(
+                queryset, serializer_kwargs["fields"]
+            )
+
+        paginator = self.pagination_class()
+        if not paginator.is_requested(self.request):
+            if self.stream_list:
+                return streaming_list_response(
+                    queryset, serializer_class(**serializer_kwargs)
+                )
+            serializer = serializer_class(queryset, many=True, **serializer_kwargs)
+            return Response(serializer.data)
+
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(page, many=True, **serializer_kwargs)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class SearchPagination(LimitOffsetPagination):
+    """
+    `limit`/`offset` pages over ranked search results, which have no stable
+    key for keyset pagination. Results are only ranked up to the end of the
+    requested page plus one, so the total isn't known and no count is
+    returned. Paging stops after SEARCH_MAX_RESULTS results.
+    """
+
+    default_limit = getattr(settings, "SEARCH_PAGE_SIZE", 20)
+    max_limit = getattr(settings, "SEARCH_MAX_PAGE_SIZE", 100)
+    max_results = getattr(settings, "SEARCH_MAX_RESULTS", 200)
+
+    def get_window(self, request):
+        """Returns the offset and limit of the requested page."""
+        self.request = request
+        self.offset = min(self.get_offset(request), self.max_results)
+        self.limit = min(self.get_limit(request), self.max_results - self.offset)
+        return self.offset, self.limit
+
+    def get_paginated_response(self, results):
+        """
+        Expects the page followed by the first result of the next page, if
+        there is one.
+        """
+        self.count = min(self.offset + len(results), self.max_results)
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": results[: self.limit],
+            }
+        )
@@ -0,0 +1,36 @@
+import codecs
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+# orjson turns integers that don't fit in 64 bits into floats, leave any
+# long run of digits to the stdlib parser
+LONG_INTEGER = re.compile(rb"\d{19}")
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser backed by orjson for UTF-8 bodies when it is installed. Bodies
+    orjson rejects or might read differently (lone surrogates, NaN, huge
+    numbers) are handed to JSONParser, which also words the parse errors.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+
+        content = stream.read()
+        if not LONG_INTEGER.search(content):
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(content), media_type, parser_context)
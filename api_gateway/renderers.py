@@ -0,0 +1,67 @@
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Dates and times go through the encoder's default() like with the stdlib
+# json module, orjson's own formatting of them differs from DRF's
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson
+    else None
+)
+
+# Floats orjson writes differently from repr(): any exponent (1e16 vs 1e+16,
+# 1e-7 vs 1e-07) and the 0.00001 form of values below 1e-4. Starting the
+# pattern with a literal keeps the scan cheap, matches inside strings only
+# cost a fallback to the stdlib encoder.
+EXPONENT = re.compile(rb"e[-0-9]")
+DIGITS = frozenset(b"0123456789")
+
+
+def float_mismatch(content):
+    if b"0.0000" in content:
+        return True
+    return any(
+        content[match.start() - 1] in DIGITS for match in EXPONENT.finditer(content)
+    )
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson when it is installed. The output is the
+    same bytes the stdlib encoder would produce with the default settings:
+    compact separators, unescaped unicode, U+2028/U+2029 escaped and the
+    types orjson doesn't handle natively (dates, Decimal, lazy strings...)
+    converted by encoder_class. Anything else falls back to JSONRenderer,
+    i.e. indented or ASCII output and data orjson can't encode, such as
+    integers over 64 bits or non-string keys. Unlike the stdlib encoder,
+    orjson renders NaN and infinity as null instead of raising.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if float_mismatch(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, see rest_framework/renderers.py. Both
+        # characters are encoded as \xe2\x80..., a single byte is faster to
+        # look for
+        if b"\xe2" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+            ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
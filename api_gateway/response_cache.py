@@ -0,0 +1,88 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.settings import api_settings
+
+from data.versions import cache_is_shared
+
+from .conditional import get_request_versions
+
+RESPONSE_CACHE_KEY = "response:{}:{}"
+RESPONSE_STATS_KEY = "response-stats:{}:{}"
+
+cached_endpoints = set()
+
+
+def count(endpoint, outcome):
+    key = RESPONSE_STATS_KEY.format(endpoint, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_response_cache_stats():
+    """Returns the {endpoint: {"hits", "misses"}} counters of cached endpoints."""
+    keys = {
+        (endpoint, outcome): RESPONSE_STATS_KEY.format(endpoint, outcome)
+        for endpoint in cached_endpoints
+        for outcome in ("hits", "misses")
+    }
+    values = cache.get_many(keys.values())
+    stats = {endpoint: {"hits": 0, "misses": 0} for endpoint in cached_endpoints}
+    for (endpoint, outcome), key in keys.items():
+        stats[endpoint][outcome] = values.get(key, 0)
+    return stats
+
+
+def cached_response(*models):
+    """
+    Caches the rendered body of a GET handler whose output depends only on
+    the URL and the rows of models. Entries are keyed by endpoint, full path
+    and the models' version counters, so every save that bumps a counter
+    retires them and stale entries simply expire. A hit returns the stored
+    bytes without running the handler. The body is always rendered with the
+    default renderer. Without a shared cache, see cache_is_shared(), nothing
+    is cached or counted, other processes would never retire the entries.
+    """
+
+    def decorator(handler):
+        endpoint = handler.__qualname__
+        cached_endpoints.add(endpoint)
+
+        @wraps(handler)
+        def wrapped(self, request, *args, **kwargs):
+            if not cache_is_shared():
+                return handler(self, request, *args, **kwargs)
+
+            versions, _ = get_request_versions(request, models)
+            scope = json.dumps([request.get_full_path(), versions], sort_keys=True)
+            key = RESPONSE_CACHE_KEY.format(
+                endpoint, hashlib.sha1(scope.encode()).hexdigest()
+            )
+            renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+            content = cache.get(key)
+            if content is None:
+                count(endpoint, "misses")
+                response = handler(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+                content = renderer.render(response.data)
+                cache.set(
+                    key, content, getattr(settings, "RESPONSE_CACHE_TIMEOUT", 86400)
+                )
+            else:
+                count(endpoint, "hits")
+
+            return HttpResponse(content, content_type=renderer.media_type)
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,159 @@
+import re
+from functools import lru_cache
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+
+from data.models import StaffDetail, StudentDetail
+
+from .serializers import (
+    StaffDetailSearchSerializer,
+    StudentDetailSearchSerializer,
+    values_serializer,
+)
+
+# Result type, searched rows, serializer of the results and the searched
+# fields. Each field has a GIN trigram index on UPPER(field) in Postgres,
+# see data/migrations/0020_search_trigram_indexes.py
+SEARCH_TARGETS = (
+    (
+        "student",
+        StudentDetail.objects.filter(graduated=False),
+        StudentDetailSearchSerializer,
+        ("enrolment_no", "first_name", "middle_name", "last_name", "email"),
+    ),
+    (
+        "staff",
+        StaffDetail.objects.filter(active=True),
+        StaffDetailSearchSerializer,
+        ("email", "short_name", "first_name", "middle_name", "last_name"),
+    ),
+)
+
+# pg_trgm's default pg_trgm.similarity_threshold, which the % operator uses
+SIMILARITY_THRESHOLD = 0.3
+
+# Ranks of a field equal to, starting with and containing the query. The
+# best trigram similarity over all fields (0-1) is added on top.
+EXACT_RANK = 3.0
+PREFIX_RANK = 2.0
+CONTAINS_RANK = 1.0
+
+
+def rank_in_database(queryset, fields, query, count):
+    """
+    Returns (rank, pk) of the count best rows of queryset, ranked by
+    Postgres. Rows match when a field contains the query or is similar to
+    it, both of which are served by the trigram indexes.
+    """
+    upper = query.upper()
+    contains = Q(*[(f"{field}__icontains", query) for field in fields], _connector=Q.OR)
+    similar = Q(
+        *[(f"search_{field}__trigram_similar", upper) for field in fields],
+        _connector=Q.OR,
+    )
+    queryset = queryset.alias(
+        **{f"search_{field}": Upper(field) for field in fields}
+    ).filter(contains | similar)
+    tiers = [
+        (EXACT_RANK, "iexact"),
+        (PREFIX_RANK, "istartswith"),
+        (CONTAINS_RANK, "icontains"),
+    ]
+    rank = Case(
+        *[
+            When(**{f"{field}__{lookup}": query}, then=Value(tier))
+            for tier, lookup in tiers
+            for field in fields
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    ) + Greatest(*[TrigramSimilarity(Upper(field), upper) for field in fields])
+    rows = (
+        queryset.annotate(search_rank=rank)
+        .order_by("-search_rank", "pk")
+        .values_list("search_rank", "pk")
+    )
+    return list(rows[:count])
+
+
+@lru_cache(maxsize=100000)
+def trigrams(value):
+    """
+    The trigrams pg_trgm extracts from value: every alphanumeric word,
+    lowercased and padded with two spaces in front and one behind.
+    """
+    ret = set()
+    for word in re.findall(r"[^\W_]+", value.lower()):
+        word = f"  {word} "
+        ret.update(map("".join, zip(word, word[1:], word[2:])))
+    return frozenset(ret)
+
+
+def similarity(left, right):
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def rank_in_memory(queryset, fields, query, count):
+    """
+    rank_in_database() computed in Python over every row, for databases
+    without pg_trgm such as the SQLite test database.
+    """
+    upper = query.upper()
+    query_trigrams = trigrams(query)
+    ranked = []
+    for pk, *values in queryset.values_list("pk", *fields).iterator():
+        tier = 0.0
+        best = 0.0
+        for value in values:
+            if value is None:
+                continue
+            value_upper = str(value).upper()
+            if value_upper == upper:
+                tier = max(tier, EXACT_RANK)
+            elif value_upper.startswith(upper):
+                tier = max(tier, PREFIX_RANK)
+            elif upper in value_upper:
+                tier = max(tier, CONTAINS_RANK)
+            best = max(best, similarity(trigrams(value_upper), query_trigrams))
+        if tier or best > SIMILARITY_THRESHOLD:
+            ranked.append((tier + best, pk))
+
+    ranked.sort(key=lambda row: (-row[0], row[1]))
+    return ranked[:count]
+
+
+def search(query, offset, limit):
+    """
+    Returns the students and staff matching query, best first, from offset
+    on and at most limit + 1 of them so callers can tell if there's more.
+    """
+    rank = rank_in_database if connection.vendor == "postgresql" else rank_in_memory
+    count = offset + limit + 1
+
+    ranked = []
+    for index, (_, queryset, _, fields) in enumerate(SEARCH_TARGETS):
+        ranked.extend(
+            (-score, index, pk) for score, pk in rank(queryset, fields, query, count)
+        )
+    ranked = sorted(ranked)[offset:count]
+
+    rows = {}
+    for index, (kind, queryset, serializer_class, _) in enumerate(SEARCH_TARGETS):
+        pks = [pk for _, target, pk in ranked if target == index]
+        if not pks:
+            continue
+        pk_name = queryset.model._meta.pk.name
+        for row in values_serializer(serializer_class).serialize(
+            queryset.filter(pk__in=pks)
+        ):
+            rows[index, row[pk_name]] = {"type": kind, **row}
+
+    # rows deleted since they were ranked are left out
+    return [
+        rows[key] for key in ((index, pk) for _, index, pk in ranked) if key in rows
+    ]
@@ -1,3 +1,7 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
 from rest_framework import serializers
 
 from data.models import (
@@ -13,13 +17,184 @@ from data.models import (
 )
 
 
-class StaffDetailSerializer(serializers.ModelSerializer):
+def source_lookup(model, source):
+    """
+    Returns the `.only()` lookup and the select_related() path read by a
+    dotted serializer source, or (None, None) for many-valued relations that
+    are loaded separately. Raises FieldDoesNotExist for sources that are not
+    backed by a column, such as properties or "*".
+    """
+    attrs = source.split(".")
+    for attr in attrs[:-1]:
+        field = model._meta.get_field(attr)
+        if not field.concrete or not (field.many_to_one or field.one_to_one):
+            raise FieldDoesNotExist(source)
+        model = field.related_model
+
+    field = model._meta.get_field(attrs[-1])
+    if field.many_to_many or field.one_to_many:
+        return None, None
+    if not field.concrete:
+        raise FieldDoesNotExist(source)
+    return "__".join(attrs), "__".join(attrs[:-1]) or None
+
+
+class SparseFieldsetMixin:
+    """
+    Lets list endpoints return a subset of the fields with `?fields=a,b,c`.
+    The serializer drops every other field and narrow_queryset() restricts
+    the selected columns to the ones the remaining fields read.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def parse_fields(cls, value):
+        fields = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = sorted(set(fields) - set(cls().fields))
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": [f"Unknown field(s): {', '.join(unknown)}."]}
+            )
+        return fields
+
+    @classmethod
+    def narrow_queryset(cls, queryset, fields):
+        model = queryset.model
+        lookups = {model._meta.pk.name}
+        related = set()
+
+        for field in cls(fields=fields).fields.values():
+            if isinstance(field, serializers.ListSerializer):
+                continue
+            if isinstance(field, serializers.Serializer):
+                sources = [
+                    f"{field.source}.{child.source}" for child in field.fields.values()
+                ]
+            else:
+                sources = [field.source]
+
+            for source in sources:
+                try:
+                    lookup, path = source_lookup(model, source)
+                except FieldDoesNotExist:
+                    return queryset  # can't tell which columns are read
+                if lookup:
+                    lookups.add(lookup)
+                if path:
+                    related.add(path)
+
+        # Relations that are not read must not be joined on deferred columns
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*lookups)
+
+
+class ValuesSerializer:
+    """
+    Read-only rendering of a flat serializer straight from `.values_list()`.
+    The declared fields, dotted sources included, are compiled once into the
+    column lookups to select and the output key of each, so listing rows
+    never instantiates a model or walks DRF's field machinery. Fields whose
+    representation is the database value as-is are copied through; the rest
+    still go through their own to_representation(), keeping the output
+    identical to the serializer's.
+    """
+
+    # serializer field -> model fields whose database value it renders as-is
+    PASSTHROUGH_FIELDS = (
+        (serializers.CharField, (models.CharField, models.TextField)),
+        (serializers.IntegerField, (models.IntegerField, models.AutoField)),
+        (serializers.BooleanField, (models.BooleanField,)),
+        (serializers.PrimaryKeyRelatedField, (models.ForeignKey,)),
+    )
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.names = []
+        self.lookups = []
+        self.converters = []
+
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+
+            try:
+                if isinstance(
+                    field,
+                    (
+                        serializers.BaseSerializer,
+                        serializers.ManyRelatedField,
+                        serializers.SerializerMethodField,
+                    ),
+                ):
+                    raise FieldDoesNotExist(name)
+                lookup, _ = source_lookup(model, field.source)
+                if lookup is None:
+                    raise FieldDoesNotExist(name)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name} can't be read with .values()"
+                )
+
+            *path, attr = field.source.split(".")
+            related_model = model
+            for relation in path:
+                related_model = related_model._meta.get_field(relation).related_model
+            model_field = related_model._meta.get_field(attr)
+
+            passthrough = any(
+                isinstance(model_field, model_classes)
+                for field_class, model_classes in self.PASSTHROUGH_FIELDS
+                if isinstance(field, field_class)
+            )
+
+            self.names.append(name)
+            self.lookups.append(lookup)
+            self.converters.append(None if passthrough else field.to_representation)
+
+    def serialize(self, queryset):
+        names = self.names
+        rows = queryset.values_list(*self.lookups)
+        converters = [
+            (index, converter)
+            for index, converter in enumerate(self.converters)
+            if converter is not None
+        ]
+        if not converters:
+            return [dict(zip(names, row)) for row in rows]
+
+        data = []
+        for row in rows:
+            row = list(row)
+            for index, converter in converters:
+                if row[index] is not None:
+                    row[index] = converter(row[index])
+            data.append(dict(zip(names, row)))
+        return data
+
+
+@lru_cache(maxsize=None)
+def values_serializer(serializer_class):
+    return ValuesSerializer(serializer_class)
+
+
+class StaffDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = StaffDetail
         fields = "__all__"
+        # Derived from PermissionGrant, see data.permissions.rebuild_permissions
+        read_only_fields = ("permissions",)
 
 
-class BranchSerializer(serializers.ModelSerializer):
+class BranchSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Branch
         fields = "__all__"
@@ -31,12 +206,32 @@ class BranchSupportSerializer(serializers.ModelSerializer):
         fields = ("branch_code", "branch_short_name")
 
 
-class StudentDetailSerializer(serializers.ModelSerializer):
+class StudentDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = StudentDetail
         fields = "__all__"
 
 
+class StudentDetailBranchSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    branch = BranchSupportSerializer(read_only=True)
+
+    class Meta:
+        model = StudentDetail
+        fields = (
+            "enrolment_no",
+            "year_joined",
+            "email",
+            "first_name",
+            "middle_name",
+            "last_name",
+            "gender",
+            "birth_date",
+            "mobile_number",
+            "graduated",
+            "branch",
+        )
+
+
 class StudentDetailSupportSerializer(serializers.ModelSerializer):
     branch_short_name = serializers.CharField(source="branch.branch_short_name")
 
@@ -89,6 +284,27 @@ class StaffDetailSupportSerializer(serializers.ModelSerializer):
         fields = ("email", "first_name", "middle_name", "last_name")
 
 
+class StaffDetailSearchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StaffDetail
+        fields = ("email", "short_name", "first_name", "middle_name", "last_name")
+
+
+class StudentDetailSearchSerializer(serializers.ModelSerializer):
+    branch_short_name = serializers.CharField(source="branch.branch_short_name")
+
+    class Meta:
+        model = StudentDetail
+        fields = (
+            "enrolment_no",
+            "email",
+            "first_name",
+            "middle_name",
+            "last_name",
+            "branch_short_name",
+        )
+
+
 class BatchSupportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Batch
@@ -212,6 +428,18 @@ class BatchSerializer(serializers.ModelSerializer):
             return None
 
 
+class BatchSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Batch
+        fields = "__all__"
+
+
+class DepartmentSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Department
+        fields = "__all__"
+
+
 class DepartmentSerializer(serializers.ModelSerializer):
     batch = BatchSupportSerializer(many=True, required=False)
     branch = BranchSupportSerializer(many=True, required=False)
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.settings import api_settings
+
+
+def iter_json_list(queryset, serializer, chunk_size):
+    """
+    Yields a JSON array of the queryset, rendered row by row with serializer
+    and the default renderer, one chunk of rows at a time. Rows are read with
+    .iterator(chunk_size), so neither the model instances nor the rendered
+    list are ever held in memory as a whole.
+    """
+    render = api_settings.DEFAULT_RENDERER_CLASSES[0]().render
+    separator = b"," if api_settings.COMPACT_JSON else b", "
+
+    yield b"["
+    fragments = []
+    first = True
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        fragment = render(serializer.to_representation(instance))
+        fragments.append(fragment if first else separator + fragment)
+        first = False
+        if len(fragments) >= chunk_size:
+            yield b"".join(fragments)
+            fragments = []
+    if fragments:
+        yield b"".join(fragments)
+    yield b"]"
+
+
+def streaming_list_response(queryset, serializer):
+    chunk_size = getattr(settings, "API_STREAM_CHUNK_SIZE", 500)
+    return StreamingHttpResponse(
+        iter_json_list(queryset, serializer, chunk_size),
+        content_type="application/json",
+    )
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from data.models import (
+    Batch,
+    Branch,
+    Department,
+    FacultyAllocation,
+    StaffDetail,
+    StudentDetail,
+    StudyResource,
+    Subject,
+    Tombstone,
+)
+from data.versions import model_label
+
+from .serializers import (
+    BatchSyncSerializer,
+    BranchSerializer,
+    DepartmentSyncSerializer,
+    StaffDetailSerializer,
+    StudentDetailSerializer,
+    SubjectSerializer,
+)
+
+# Key in the response, rows and serializer of every model in data.sync's
+# SYNCED_MODELS. Many-to-many fields are rendered as lists of primary keys.
+SYNC_TARGETS = (
+    ("student", StudentDetail.objects.all(), StudentDetailSerializer),
+    ("staff", StaffDetail.objects.all(), StaffDetailSerializer),
+    ("branch", Branch.objects.all(), BranchSerializer),
+    ("subject", Subject.objects.prefetch_related("weightage"), SubjectSerializer),
+    (
+        "batch",
+        Batch.objects.prefetch_related(
+            Prefetch("faculty", queryset=FacultyAllocation.objects.only("pk")),
+            Prefetch("student", queryset=StudentDetail.objects.only("pk")),
+        ),
+        BatchSyncSerializer,
+    ),
+    (
+        "department",
+        Department.objects.prefetch_related(
+            Prefetch("branch", queryset=Branch.objects.only("pk")),
+            Prefetch("batch", queryset=Batch.objects.only("pk")),
+            Prefetch("study_resource", queryset=StudyResource.objects.only("pk")),
+        ),
+        DepartmentSyncSerializer,
+    ),
+)
+
+
+def parse_token(token):
+    """Returns the time a sync token was issued at. Raises ValueError."""
+    since = datetime.fromisoformat(token)
+    # Tokens are naive local times, USE_TZ is off
+    if since.tzinfo is not None:
+        raise ValueError(token)
+    return since
+
+
+def sync(since=None):
+    """
+    Returns the records of every synced model updated, and the primary keys
+    of those deleted, since the token since was issued, along with the next
+    token. Without a token, or with one older than the tombstones are kept,
+    every record is returned and reset tells the client to drop its copy.
+
+    Tokens are compared to the time rows were saved, not committed, so a
+    transaction running longer than SYNC_TOKEN_OVERLAP can commit rows that
+    no later poll picks up. Polls may return a record more than once.
+    """
+    now = timezone.now()
+    retention = timedelta(
+        seconds=getattr(settings, "SYNC_TOMBSTONE_RETENTION", 60 * 60 * 24 * 90)
+    )
+    reset = since is None or since < now - retention
+    if not reset:
+        # Rows saved in a transaction that committed after the previous
+        # token was issued carry an earlier timestamp, poll with some overlap
+        since -= timedelta(seconds=getattr(settings, "SYNC_TOKEN_OVERLAP", 60))
+
+    deleted = defaultdict(set)
+    if not reset:
+        for model, object_pk in Tombstone.objects.filter(
+            deleted_at__gte=since
+        ).values_list("model", "object_pk"):
+            deleted[model].add(object_pk)
+
+    changes = {}
+    for name, queryset, serializer_class in SYNC_TARGETS:
+        if not reset:
+            queryset = queryset.filter(update_timestamp__gte=since)
+        pk = queryset.model._meta.pk
+        updated = serializer_class(queryset.order_by("pk"), many=True).data
+
+        # Deleted and created again since the token, i.e. updated
+        recreated = {str(row[pk.name]) for row in updated}
+        changes[name] = {
+            "updated": updated,
+            "deleted": sorted(
+                pk.to_python(object_pk)
+                for object_pk in deleted[model_label(queryset.model)] - recreated
+            ),
+        }
+
+    return {"token": now.isoformat(), "reset": reset, "changes": changes}
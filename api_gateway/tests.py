@@ -1,3 +1,1203 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import uuid
+import zlib
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from authentication.claims import get_authorization_version
+from authentication.profile import profile_cache_key
+from authentication.serializers import RoleTokenObtainPairSerializer
+from data import versions
+from data.imports import import_students
+from data.models import (
+    Batch,
+    Branch,
+    Department,
+    FacultyAllocation,
+    StaffDetail,
+    StudentDetail,
+    Subject,
+    Tombstone,
+    Weightage,
+)
+from LJConnect.middleware import negotiate_encoding
+
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+from .response_cache import get_response_cache_stats
+from .search import search, trigrams
+from .serializers import (
+    BatchSerializer,
+    BranchSupportSerializer,
+    DepartmentSupportSerializer,
+    StaffDetailSerializer,
+    StaffDetailSupportSerializer,
+    StudentDetailBranchSerializer,
+    StudentDetailSupportSerializer,
+    values_serializer,
+)
+
+User = get_user_model()
+
+
+class APITestCase(TestCase):
+    fixtures = [
+        "data/test_fixtures/PermissionAutomationTestCase.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        StaffDetail.objects.filter(email="staff1@ljku.edu.in").update(admin=True)
+        user = User.objects.create(
+            username="staff1", email="staff1@ljku.edu.in", first_name="fname1"
+        )
+        access = RoleTokenObtainPairSerializer.get_token(user).access_token
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+
+    def get_json(self, url):
+        response = self.client.get(url, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return response.json()
+
+    def create_students(self, count):
+        branch = Branch.objects.first()
+        StudentDetail.objects.bulk_create(
+            [
+                StudentDetail(
+                    enrolment_no=f"99000{number:04}",
+                    email=f"99000{number:04}@ljku.edu.in",
+                    first_name="fname",
+                    last_name="lname",
+                    gender="M",
+                    birth_date=date(2004, 1, 1),
+                    mobile_number="+911234567890",
+                    branch=branch,
+                )
+                for number in range(count)
+            ]
+        )
+
+
+class StudentDetailAPITestCase(APITestCase):
+    def test_nested_branch(self):
+        with self.assertNumQueries(1):
+            students = self.get_json(reverse("student-list"))
+
+        branch = Branch.objects.first()
+        for student in students:
+            self.assertEqual(
+                student["branch"],
+                {
+                    "branch_code": branch.branch_code,
+                    "branch_short_name": branch.branch_short_name,
+                },
+            )
+
+    def test_constant_query_count(self):
+        self.create_students(50)
+
+        with self.assertNumQueries(1):
+            students = self.get_json(reverse("student-list"))
+
+        self.assertEqual(len(students), 52)
+
+
+class StreamingListTestCase(APITestCase):
+    def test_matches_json_renderer(self):
+        self.create_students(5)
+        StudentDetail.objects.filter(enrolment_no="990000000").update(
+            first_name="Ærø\u2028"
+        )
+
+        response = self.client.get(reverse("student-list"), **self.headers)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        students = StudentDetail.objects.select_related("branch")
+        expected = JSONRenderer().render(
+            StudentDetailBranchSerializer(students, many=True).data
+        )
+        self.assertEqual(b"".join(response.streaming_content), expected)
+
+    @override_settings(API_STREAM_CHUNK_SIZE=2)
+    def test_chunks(self):
+        self.create_students(5)
+        response = self.client.get(reverse("student-list"), **self.headers)
+        chunks = list(response.streaming_content)
+
+        # opening bracket, 7 rows in chunks of two, closing bracket
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual(len(json.loads(b"".join(chunks))), 7)
+
+    def test_empty_list(self):
+        StudentDetail.objects.all().delete()
+        self.assertEqual(self.get_json(reverse("student-list")), [])
+
+
+class KeysetPaginationTestCase(APITestCase):
+    def test_page_through_students(self):
+        self.create_students(45)
+
+        url = f"{reverse('student-list')}?page_size=20"
+        enrolment_nos = []
+        pages = 0
+        while url:
+            response = self.client.get(url, **self.headers)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page["results"]), 20)
+            enrolment_nos += [student["enrolment_no"] for student in page["results"]]
+            url = page["next"]
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            enrolment_nos,
+            sorted(StudentDetail.objects.values_list("enrolment_no", flat=True)),
+        )
+
+    def test_pages_run_in_constant_queries(self):
+        self.create_students(45)
+
+        response = self.client.get(
+            f"{reverse('student-list')}?page_size=10", **self.headers
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(response.json()["next"], **self.headers)
+        self.assertEqual(len(response.json()["results"]), 10)
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(reverse("staff-list"), **self.headers)
+        self.assertEqual(len(response.json()), 3)
+
+        response = self.client.get(
+            f"{reverse('staff-list')}?page_size=2", **self.headers
+        )
+        page = response.json()
+        self.assertEqual(
+            [staff["email"] for staff in page["results"]],
+            ["staff1@ljku.edu.in", "staff2@ljku.edu.in"],
+        )
+        self.assertIsNotNone(page["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            f"{reverse('batch-list')}?cursor=garbage", **self.headers
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsetTestCase(APITestCase):
+    def test_staff_fields_narrow_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            staff = self.get_json(f"{reverse('staff-list')}?fields=email,first_name")
+
+        self.assertEqual(
+            staff[0], {"email": "staff1@ljku.edu.in", "first_name": "fname1"}
+        )
+        self.assertNotIn("permissions", queries[-1]["sql"])
+        self.assertNotIn("mobile_number", queries[-1]["sql"])
+
+    def test_nested_branch_field(self):
+        branch = Branch.objects.first()
+
+        with self.assertNumQueries(1):
+            students = self.get_json(
+                f"{reverse('student-list')}?fields=enrolment_no,branch"
+            )
+        self.assertEqual(
+            students[0]["branch"],
+            {
+                "branch_code": branch.branch_code,
+                "branch_short_name": branch.branch_short_name,
+            },
+        )
+        self.assertEqual(list(students[0]), ["enrolment_no", "branch"])
+
+        with CaptureQueriesContext(connection) as queries:
+            students = self.get_json(f"{reverse('student-list')}?fields=email")
+        self.assertEqual(list(students[0]), ["email"])
+        self.assertNotIn("JOIN", queries[-1]["sql"])
+
+    def test_fields_with_pagination(self):
+        page = self.get_json(f"{reverse('staff-list')}?fields=email&page_size=2")
+        self.assertEqual(
+            page["results"],
+            [{"email": "staff1@ljku.edu.in"}, {"email": "staff2@ljku.edu.in"}],
+        )
+
+    def test_unknown_field(self):
+        response = self.client.get(
+            f"{reverse('staff-list')}?fields=email,password", **self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"fields": ["Unknown field(s): password."]})
+
+
+@override_settings(CACHE_IS_SHARED=True)
+class ConditionalGetTestCase(APITestCase):
+    def test_not_modified(self):
+        response = self.client.get(reverse("branch-list"), **self.headers)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn("Last-Modified", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse("branch-list"), HTTP_IF_NONE_MATCH=etag, **self.headers
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        branch = Branch.objects.first()
+        branch.branch_short_name = "NEW"
+        branch.save()
+
+        response = self.client.get(
+            reverse("branch-list"), HTTP_IF_NONE_MATCH=etag, **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_failed_bump_rolls_back(self):
+        branch = Branch.objects.first()
+        branch.branch_short_name = "NEW"
+        with mock.patch.object(cache, "incr", side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError), transaction.atomic():
+                branch.save()
+        self.assertNotEqual(Branch.objects.first().branch_short_name, "NEW")
+
+        # Once committed, a failure is only logged
+        with mock.patch.object(cache, "incr", side_effect=ConnectionError):
+            with self.assertLogs("data.versions", "ERROR"):
+                versions._bump_committed(["data.branch"])
+
+    def test_m2m_change_invalidates(self):
+        response = self.client.get(reverse("department-list"), **self.headers)
+        etag = response["ETag"]
+
+        Department.objects.first().batch.add(Batch.objects.create(name="B3"))
+
+        response = self.client.get(
+            reverse("department-list"), HTTP_IF_NONE_MATCH=etag, **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_unrelated_change_keeps_etag(self):
+        response = self.client.get(reverse("branch-list"), **self.headers)
+        etag = response["ETag"]
+
+        StudentDetail.objects.first().save()
+
+        response = self.client.get(
+            reverse("branch-list"), HTTP_IF_NONE_MATCH=etag, **self.headers
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_is_scoped_to_query_and_user(self):
+        url = reverse("staff-list")
+        etag = self.client.get(url, **self.headers)["ETag"]
+
+        self.assertNotEqual(
+            self.client.get(f"{url}?fields=email", **self.headers)["ETag"], etag
+        )
+
+        StaffDetail.objects.filter(email="staff2@ljku.edu.in").update(admin=True)
+        user = User.objects.create(username="staff2", email="staff2@ljku.edu.in")
+        access = RoleTokenObtainPairSerializer.get_token(user).access_token
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=etag, HTTP_AUTHORIZATION=f"Bearer {access}"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_permission_rebuild_invalidates_staff(self):
+        etag = self.client.get(reverse("staff-list"), **self.headers)["ETag"]
+
+        Batch.objects.get(name="B1").delete()
+
+        response = self.client.get(
+            reverse("staff-list"), HTTP_IF_NONE_MATCH=etag, **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_unauthenticated_request_is_rejected_first(self):
+        etag = self.client.get(reverse("branch-list"), **self.headers)["ETag"]
+        response = self.client.get(reverse("branch-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(CACHE_IS_SHARED=None)
+    def test_disabled_without_shared_cache(self):
+        response = self.client.get(reverse("branch-list"), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+        response = self.client.get(
+            reverse("branch-list"), HTTP_IF_NONE_MATCH="*", **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHE_IS_SHARED=True)
+class ResponseCacheTestCase(APITestCase):
+    def test_warm_hit_skips_the_orm(self):
+        url = reverse("student-compact-list")
+        first = self.client.get(url, **self.headers)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url, **self.headers)
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second["Content-Type"], "application/json")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(
+            get_response_cache_stats()["StudentDetailCompactAPI.get"],
+            {"hits": 1, "misses": 1},
+        )
+
+    def test_invalidated_by_saves(self):
+        url = reverse("branch-compact-list")
+        self.client.get(url, **self.headers)
+
+        branch = Branch.objects.first()
+        branch.branch_short_name = "NEW"
+        branch.save()
+
+        response = self.client.get(url, **self.headers)
+        self.assertEqual(response.json()[0]["branch_short_name"], "NEW")
+
+        url = reverse("student-compact-list")
+        self.client.get(url, **self.headers)
+
+        student = StudentDetail.objects.first()
+        student.first_name = "renamed"
+        student.save()
+
+        self.assertIn(b"renamed", self.client.get(url, **self.headers).content)
+
+    def test_stats_command(self):
+        self.client.get(reverse("staff-list-compact"), **self.headers)
+        self.client.get(reverse("staff-list-compact"), **self.headers)
+
+        out = StringIO()
+        call_command("response_cache_stats", stdout=out)
+        self.assertIn(
+            "StaffDetailCompactAPI.get: 1 hits, 1 misses (50% hit rate)",
+            out.getvalue(),
+        )
+
+    @override_settings(CACHE_IS_SHARED=None)
+    def test_disabled_without_shared_cache(self):
+        url = reverse("student-compact-list")
+        self.client.get(url, **self.headers)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            get_response_cache_stats()["StudentDetailCompactAPI.get"],
+            {"hits": 0, "misses": 0},
+        )
+        with self.assertRaises(CommandError):
+            call_command("response_cache_stats", stdout=StringIO())
+
+
+class ORJSONTestCase(APITestCase):
+    payloads = [
+        None,
+        [],
+        {"name": 'Ærø \u2028\u2029 \x00\x1f\x7f \\ " 😀', "nested": [True, None]},
+        [0.1, -2.5, 1e15, 1e16, 1.5e-5, 1e-7, 5e-324, 2**63, 2**64],
+        {
+            "date": date(2004, 1, 31),
+            "datetime": datetime(2023, 8, 1, 10, 30, 15, 123456, timezone.utc),
+            "time": time(10, 30, 15, 500),
+            "timedelta": timedelta(days=1, seconds=3),
+            "decimal": Decimal("12.50"),
+            "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        },
+        {1: "non-string key"},
+        ReturnList([{"a": 1}], serializer=None),
+    ]
+
+    def test_renderer_matches_json_renderer(self):
+        for payload in self.payloads:
+            with self.subTest(payload=payload):
+                self.assertEqual(
+                    ORJSONRenderer().render(payload), JSONRenderer().render(payload)
+                )
+
+    def test_renderer_without_orjson(self):
+        with mock.patch("api_gateway.renderers.orjson", None):
+            for payload in self.payloads:
+                self.assertEqual(
+                    ORJSONRenderer().render(payload), JSONRenderer().render(payload)
+                )
+
+    def test_renderer_indent(self):
+        for media_type in ["application/json; indent=2", "application/json; indent=0"]:
+            self.assertEqual(
+                ORJSONRenderer().render([1], media_type),
+                JSONRenderer().render([1], media_type),
+            )
+
+    def test_parser_matches_json_parser(self):
+        for content in [
+            b'{"birth_date": "31/01/2004", "marks": [1, 2.5, -0.0]}',
+            '["Ærø\u2028"]'.encode(),
+            b'["\\ud800", 18446744073709551616]',
+        ]:
+            with self.subTest(content=content):
+                self.assertEqual(
+                    ORJSONParser().parse(BytesIO(content)),
+                    JSONParser().parse(BytesIO(content)),
+                )
+
+    def test_parser_errors(self):
+        for content in [b"{", b"[NaN]", b""]:
+            with self.subTest(content=content):
+                with self.assertRaises(ParseError) as expected:
+                    JSONParser().parse(BytesIO(content))
+                with self.assertRaises(ParseError) as error:
+                    ORJSONParser().parse(BytesIO(content))
+                self.assertEqual(str(error.exception), str(expected.exception))
+
+    def test_default_renderer_and_parser(self):
+        response = self.client.post(
+            reverse("branch-list"),
+            {
+                "branch_code": "99",
+                "branch_short_name": "NEW",
+                "branch_full_name": "New",
+            },
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+class CompressionTestCase(APITestCase):
+    def get(self, url, **extra):
+        return self.client.get(
+            url, HTTP_ACCEPT_ENCODING="gzip", **extra, **self.headers
+        )
+
+    def test_streaming_list(self):
+        self.create_students(50)
+        plain = self.get_json(reverse("student-list"))
+
+        with self.assertLogs("LJConnect.middleware", "INFO") as logs:
+            response = self.get(reverse("student-list"))
+            content = b"".join(response.streaming_content)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(json.loads(gzip.decompress(content)), plain)
+        self.assertIn(f"GET {reverse('student-list')}: gzip", logs.output[0])
+
+    @override_settings(API_STREAM_CHUNK_SIZE=5)
+    def test_streaming_chunks_are_decodable(self):
+        self.create_students(50)
+        response = self.get(reverse("student-list"))
+
+        decompressor = zlib.decompressobj(31)
+        pieces = [
+            decompressor.decompress(chunk) for chunk in response.streaming_content
+        ]
+
+        # opening bracket, 52 rows in chunks of five, closing bracket and the
+        # gzip trailer, each decodable as soon as it arrives
+        self.assertEqual(len(pieces), 14)
+        self.assertEqual(pieces[0], b"[")
+        for piece in pieces[1:-2]:
+            self.assertEqual(piece[-1:], b"}")
+        self.assertEqual(len(json.loads(b"".join(pieces))), 52)
+
+    def test_rendered_response(self):
+        self.create_students(50)
+        plain = self.client.get(reverse("student-compact-list"), **self.headers)
+        response = self.get(reverse("student-compact-list"))
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_below_threshold(self):
+        response = self.get(reverse("branch-compact-list"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        with override_settings(COMPRESSION_MIN_SIZE=10**6):
+            self.create_students(50)
+            response = self.get(reverse("student-list"))
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(len(json.loads(b"".join(response.streaming_content))), 52)
+
+    def test_not_accepted(self):
+        self.create_students(50)
+        response = self.client.get(reverse("student-compact-list"), **self.headers)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(negotiate_encoding("*"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0, deflate"))
+        self.assertIsNone(negotiate_encoding(""))
+
+        with mock.patch("LJConnect.middleware.brotli", mock.Mock()):
+            self.assertEqual(negotiate_encoding("gzip, deflate, br"), "br")
+            self.assertEqual(negotiate_encoding("br;q=0.5, gzip"), "gzip")
+
+
+class SearchTestCase(APITestCase):
+    def search(self, query, **params):
+        return self.client.get(
+            reverse("search"), {"q": query, **params}, **self.headers
+        )
+
+    def test_ranking(self):
+        StudentDetail.objects.filter(enrolment_no="25468521266").update(
+            first_name="Harsh", last_name="Dobariya"
+        )
+        StaffDetail.objects.filter(email="staff2@ljku.edu.in").update(
+            first_name="Harshil", short_name="HSD"
+        )
+        StaffDetail.objects.filter(email="staff3@ljku.edu.in").update(
+            last_name="Maharshi"
+        )
+
+        results = self.search("harsh").json()["results"]
+
+        # exact, prefix and substring matches, in that order
+        self.assertEqual(
+            [(result["type"], result["first_name"]) for result in results],
+            [("student", "Harsh"), ("staff", "Harshil"), ("staff", "fname3")],
+        )
+        self.assertEqual(
+            results[0],
+            {
+                "type": "student",
+                "enrolment_no": "25468521266",
+                "email": "student2@ljku.edu.in",
+                "first_name": "Harsh",
+                "middle_name": None,
+                "last_name": "Dobariya",
+                "branch_short_name": Branch.objects.get(
+                    studentdetail__enrolment_no="25468521266"
+                ).branch_short_name,
+            },
+        )
+
+    def test_fuzzy_match(self):
+        StudentDetail.objects.filter(enrolment_no="25468521266").update(
+            last_name="Dobariya"
+        )
+        results = self.search("dobaria").json()["results"]
+        self.assertEqual(
+            [result["enrolment_no"] for result in results], ["25468521266"]
+        )
+
+    def test_fields(self):
+        self.assertEqual(
+            self.search("FML2").json()["results"][0]["email"], "staff2@ljku.edu.in"
+        )
+        self.assertEqual(self.search("4685212").json()["results"][0]["type"], "student")
+
+    def test_excludes_inactive(self):
+        StudentDetail.objects.filter(enrolment_no="25468521265").update(graduated=True)
+        StaffDetail.objects.filter(email="staff2@ljku.edu.in").update(active=False)
+
+        results = self.search("fname").json()["results"]
+        self.assertEqual(
+            {result.get("enrolment_no") or result["email"] for result in results},
+            {"25468521266", "staff1@ljku.edu.in", "staff3@ljku.edu.in"},
+        )
+
+    def test_pagination(self):
+        self.create_students(30)
+
+        page = self.search("99000", limit=20).json()
+        self.assertEqual(len(page["results"]), 20)
+        self.assertIsNone(page["previous"])
+        self.assertEqual(page["results"][0]["enrolment_no"], "990000000")
+
+        page = self.client.get(page["next"], **self.headers).json()
+        self.assertEqual(len(page["results"]), 10)
+        self.assertIsNone(page["next"])
+        self.assertEqual(page["results"][0]["enrolment_no"], "990000020")
+
+    @override_settings(SEARCH_MIN_LENGTH=3)
+    def test_short_query(self):
+        self.assertEqual(self.search("ab").status_code, 400)
+        self.assertEqual(self.search("").status_code, 400)
+
+    def test_limits(self):
+        self.create_students(30)
+        with mock.patch("api_gateway.pagination.SearchPagination.max_results", 25):
+            page = self.search("99000", offset=20, limit=20).json()
+        self.assertEqual(len(page["results"]), 5)
+        self.assertIsNone(page["next"])
+
+    def test_trigrams(self):
+        # SELECT show_trgm('Cat-9')
+        self.assertEqual(trigrams("Cat-9"), {"  c", " ca", "cat", "at ", "  9", " 9 "})
+        self.assertEqual(search("Xyz", 0, 10), [])
+
+
+class BulkUpsertTestCase(APITestCase):
+    def put(self, url_name, rows):
+        return self.client.put(
+            reverse(url_name),
+            json.dumps(rows),
+            content_type="application/json",
+            **self.headers,
+        )
+
+    def student(self, number, **fields):
+        return {
+            "enrolment_no": f"77{number:03}",
+            "email": f"77{number:03}@ljku.edu.in",
+            "first_name": "A",
+            "last_name": "B",
+            "gender": "M",
+            "birth_date": "2004-02-01",
+            "mobile_number": "1234567",
+            "branch": "2654862341",
+            **fields,
+        }
+
+    def test_staff_upsert(self):
+        before = StaffDetail.objects.get(pk="staff2@ljku.edu.in")
+        response = self.put(
+            "staff-list",
+            [
+                {"email": "staff2@ljku.edu.in", "first_name": "renamed"},
+                {"email": "staff3@ljku.edu.in", "admin": True},
+                {
+                    "email": "staff9@ljku.edu.in",
+                    "first_name": "fname9",
+                    "last_name": "lname9",
+                    "short_name": "FML9",
+                    "gender": "F",
+                    "birth_date": "1990-02-01",
+                    "mobile_number": "+911234567890",
+                    "category": "T",
+                },
+            ],
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"created": 1, "updated": 2})
+        staff = StaffDetail.objects.get(pk="staff2@ljku.edu.in")
+        self.assertEqual(staff.first_name, "renamed")
+        self.assertEqual(staff.last_name, before.last_name)
+        self.assertGreater(staff.update_timestamp, before.update_timestamp)
+        self.assertTrue(StaffDetail.objects.get(pk="staff3@ljku.edu.in").admin)
+        self.assertEqual(StaffDetail.objects.get(pk="staff9@ljku.edu.in").gender, "F")
+
+        self.assertEqual(get_authorization_version("staff2@ljku.edu.in"), 0)
+        self.assertEqual(get_authorization_version("staff3@ljku.edu.in"), 1)
+        self.assertEqual(get_authorization_version("staff9@ljku.edu.in"), 1)
+
+    def test_permissions_are_read_only(self):
+        permissions = StaffDetail.objects.get(pk="staff2@ljku.edu.in").permissions
+        self.assertTrue(permissions)
+
+        response = self.put(
+            "staff-list", [{"email": "staff2@ljku.edu.in", "permissions": {}}]
+        )
+        self.assertEqual(response.json(), {"created": 0, "updated": 1})
+
+        data = self.get_json(reverse("staff-list"))
+        staff = next(row for row in data if row["email"] == "staff2@ljku.edu.in")
+        response = self.client.put(
+            reverse("staff-list"),
+            json.dumps({**staff, "permissions": {}}),
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["permissions"], permissions)
+        self.assertEqual(
+            StaffDetail.objects.get(pk="staff2@ljku.edu.in").permissions, permissions
+        )
+
+    def test_student_upsert(self):
+        for email in ("student1@ljku.edu.in", "77001@ljku.edu.in"):
+            cache.set(profile_cache_key(email), {"role": "guest"})
+        response = self.put(
+            "student-list",
+            [
+                {"enrolment_no": "25468521265", "graduated": True},
+                self.student(1),
+                self.student(2, middle_name="C"),
+            ],
+        )
+
+        self.assertEqual(response.json(), {"created": 2, "updated": 1})
+        self.assertTrue(StudentDetail.objects.get(pk="25468521265").graduated)
+        self.assertEqual(StudentDetail.objects.get(pk="77002").middle_name, "C")
+        self.assertEqual(get_authorization_version("student1@ljku.edu.in"), 1)
+        self.assertIsNone(cache.get(profile_cache_key("student1@ljku.edu.in")))
+        self.assertIsNone(cache.get(profile_cache_key("77001@ljku.edu.in")))
+
+    def test_errors(self):
+        response = self.put(
+            "student-list",
+            [
+                {"enrolment_no": "25468521265", "first_name": "renamed"},
+                {"enrolment_no": "25468521266", "email": "student1@ljku.edu.in"},
+                self.student(1, branch="CE", mobile_number="12-34"),
+                self.student(2, email="77003@ljku.edu.in"),
+                self.student(3),
+                self.student(2),
+                self.student(4, enrolment_no=None),
+                "student",
+            ],
+        )
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertEqual(
+            errors[1], {"email": ["Student Detail with this Email already exists."]}
+        )
+        self.assertEqual(sorted(errors[2]), ["branch", "mobile_number"])
+        self.assertEqual(errors[3], {})
+        self.assertEqual(list(errors[4]), ["email"])
+        self.assertEqual(errors[5], {"enrolment_no": ["Listed more than once."]})
+        self.assertEqual(list(errors[6]), ["enrolment_no"])
+        self.assertEqual(list(errors[7]), ["non_field_errors"])
+        # nothing is written
+        self.assertEqual(
+            StudentDetail.objects.get(pk="25468521265").first_name, "sfname1"
+        )
+        self.assertFalse(StudentDetail.objects.filter(pk="77003").exists())
+
+    def test_queries(self):
+        def queries(count):
+            rows = [self.student(number) for number in range(count)]
+            rows += [
+                {"enrolment_no": row["enrolment_no"], "first_name": "C"} for row in rows
+            ]
+            StudentDetail.objects.filter(enrolment_no__startswith="77").delete()
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(
+                    self.put("student-list", rows[:count]).status_code, 200
+                )
+                self.assertEqual(
+                    self.put("student-list", rows[count:]).status_code, 200
+                )
+            return len(context.captured_queries)
+
+        self.assertEqual(queries(2), queries(20))
+
+    @override_settings(BULK_UPSERT_MAX_ROWS=1)
+    def test_max_rows(self):
+        response = self.put("student-list", [self.student(1), self.student(2)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StudentDetail.objects.filter(pk="77001").exists())
+
+    def test_single_record(self):
+        response = self.put(
+            "staff-list",
+            {
+                **StaffDetailSerializer(
+                    StaffDetail.objects.get(pk="staff2@ljku.edu.in")
+                ).data,
+                "first_name": "renamed",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["first_name"], "renamed")
+
+
+IMPORT_HEADER = (
+    "enrolment_no,email,first_name,middle_name,last_name,gender,birth_date,"
+    "mobile_number,branch,year_joined,graduated"
+)
+
+
+class StudentImportTestCase(APITestCase):
+    def upload(self, lines, name="students.csv"):
+        content = "\n".join([IMPORT_HEADER, *lines]).encode()
+        return self.client.post(
+            reverse("student-import"),
+            {"file": SimpleUploadedFile(name, content)},
+            **self.headers,
+        )
+
+    def test_import(self):
+        cache.set(profile_cache_key("77001@ljku.edu.in"), {"role": "guest"})
+        response = self.upload(
+            [
+                "77001,77001@ljku.edu.in,A,B,C,M,01/02/2004,+911234567890,2654862341,,",
+                "",
+                "77002,77002@ljku.edu.in,D,,E,female,2004-02-03,1234567,2654862341,"
+                "2021,yes",
+                "77003,student1@ljku.edu.in,F,,G,X,31/02/2004,12-34,CE,abc,maybe",
+                "77001,77004@ljku.edu.in,,,H,M,01/02/2004,1234567,2654862341,,",
+            ]
+        )
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report["created"], 2)
+        self.assertEqual([error["row"] for error in report["errors"]], [5, 6])
+        self.assertEqual(
+            sorted(report["errors"][0]["errors"]),
+            [
+                "birth_date",
+                "branch",
+                "email",
+                "gender",
+                "graduated",
+                "mobile_number",
+                "year_joined",
+            ],
+        )
+        self.assertEqual(
+            sorted(report["errors"][1]["errors"]), ["enrolment_no", "first_name"]
+        )
+
+        student = StudentDetail.objects.get(pk="77002")
+        self.assertEqual(student.gender, "F")
+        self.assertEqual(student.birth_date, date(2004, 2, 3))
+        self.assertEqual(student.year_joined, 2021)
+        self.assertTrue(student.graduated)
+        self.assertIsNone(student.middle_name)
+        self.assertEqual(StudentDetail.objects.get(pk="77001").middle_name, "B")
+        self.assertEqual(get_authorization_version("77001@ljku.edu.in"), 1)
+        self.assertIsNone(cache.get(profile_cache_key("77001@ljku.edu.in")))
+
+    def test_invalid_uploads(self):
+        response = self.upload(["77001,bad,A,,C,M,01/02/2004,1234567,2654862341,,"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["errors"][0]["errors"]["email"],
+            ["Enter a valid email address."],
+        )
+
+        response = self.upload([], name="students.txt")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.upload([], name="students.xlsx")
+        self.assertEqual(
+            response.json(), {"file": ["The file is not a valid XLSX workbook."]}
+        )
+
+        response = self.client.post(reverse("student-import"), **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(STUDENT_IMPORT_BATCH_SIZE=20, CACHE_IS_SHARED=True)
+    def test_batches(self):
+        lines = [
+            f"77{number:03},77{number:03}@ljku.edu.in,A,,B,M,01/02/2004,1234567,"
+            "2654862341,,"
+            for number in range(50)
+        ]
+        etag = self.client.get(reverse("student-compact-list"), **self.headers)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload(lines)
+        self.assertEqual(response.json(), {"created": 50, "errors": []})
+        inserts = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "data_studentdetail"')
+        ]
+        self.assertEqual(len(inserts), 3)
+
+        response = self.client.get(
+            reverse("student-compact-list"), HTTP_IF_NONE_MATCH=etag, **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_xlsx(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(IMPORT_HEADER.split(","))
+        sheet.append(
+            [
+                77001,
+                "77001@ljku.edu.in",
+                "A",
+                None,
+                "B",
+                "M",
+                datetime(2004, 2, 1),
+                911234567890,
+                2654862341,
+                2022,
+                False,
+            ]
+        )
+        file = BytesIO()
+        workbook.save(file)
+        file.seek(0)
+
+        self.assertEqual(import_students(file, "xlsx"), {"created": 1, "errors": []})
+        student = StudentDetail.objects.get(pk="77001")
+        self.assertEqual(student.birth_date, date(2004, 2, 1))
+        self.assertEqual(student.mobile_number, "911234567890")
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "students.csv")
+            with open(path, "w") as file:
+                file.write(
+                    f"{IMPORT_HEADER}\n"
+                    "77001,77001@ljku.edu.in,A,,C,M,01/02/2004,1234567,2654862341,,\n"
+                    "77002,77002@ljku.edu.in,A,,C,M,01/02/2004,1234567,CE,,\n"
+                )
+            stdout = StringIO()
+            call_command("import_students", path, stdout=stdout)
+
+        output = stdout.getvalue()
+        self.assertIn('Row 3: branch: Branch "CE" does not exist.', output)
+        self.assertIn("Imported 1 student(s), rejected 1 row(s)", output)
+        self.assertTrue(StudentDetail.objects.filter(pk="77001").exists())
+
+
+@override_settings(SYNC_TOKEN_OVERLAP=0)
+class SyncTestCase(APITestCase):
+    def sync(self, token=None):
+        params = {"since": token} if token else {}
+        response = self.client.get(reverse("sync"), params, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def updated(self, data, name, key="id"):
+        return [row[key] for row in data["changes"][name]["updated"]]
+
+    def test_failed_tombstone_rolls_back_delete(self):
+        branch = Branch.objects.first()
+        with mock.patch(
+            "data.signals.record_tombstone", side_effect=RuntimeError("boom")
+        ):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                branch.delete()
+        self.assertTrue(Branch.objects.filter(pk=branch.pk).exists())
+
+    def test_full_sync(self):
+        data = self.sync()
+
+        self.assertTrue(data["reset"])
+        self.assertEqual(
+            len(data["changes"]["student"]["updated"]), StudentDetail.objects.count()
+        )
+        self.assertEqual(
+            len(data["changes"]["department"]["updated"]), Department.objects.count()
+        )
+        self.assertIn("update_timestamp", data["changes"]["staff"]["updated"][0])
+
+    def test_changes_since_token(self):
+        token = self.sync()["token"]
+
+        student = StudentDetail.objects.first()
+        student.first_name = "renamed"
+        student.save()
+        batch = Batch.objects.create(name="B9")
+        batch.student.add(student)
+
+        data = self.sync(token)
+        self.assertFalse(data["reset"])
+        self.assertEqual(
+            [row["first_name"] for row in data["changes"]["student"]["updated"]],
+            ["renamed"],
+        )
+        self.assertEqual(
+            data["changes"]["batch"]["updated"][0]["student"], [student.pk]
+        )
+        self.assertEqual(data["changes"]["staff"], {"updated": [], "deleted": []})
+
+        self.assertEqual(self.sync(data["token"])["changes"]["student"]["updated"], [])
+
+    def test_deletes(self):
+        token = self.sync()["token"]
+        department = Department.objects.first()
+        batch = department.batch.first()
+        batch_pk = batch.pk
+
+        batch.delete()
+        student = StudentDetail.objects.first()
+        values = {
+            field.attname: getattr(student, field.attname)
+            for field in StudentDetail._meta.concrete_fields
+        }
+        student.delete()
+        StudentDetail.objects.create(**values)
+
+        data = self.sync(token)
+        self.assertEqual(data["changes"]["batch"]["deleted"], [batch_pk])
+        # deleted and created again
+        self.assertEqual(data["changes"]["student"]["deleted"], [])
+        self.assertEqual(
+            self.updated(data, "student", "enrolment_no"), [values["enrolment_no"]]
+        )
+        # the batch left the department with the delete
+        self.assertEqual(self.updated(data, "department"), [department.pk])
+        self.assertNotIn(batch_pk, data["changes"]["department"]["updated"][0]["batch"])
+
+    def test_related_changes(self):
+        subject = Subject.objects.create(
+            subject_code="S1",
+            subject_short_name="S1",
+            subject_full_name="Subject",
+            total_credit=4,
+            theory_credit=4,
+        )
+        weightage = Weightage.objects.create(
+            teaching_type="T",
+            category="MCQ",
+            percentage_weightage=50,
+            marks_weightage=50,
+        )
+        subject.weightage.add(weightage)
+        token = self.sync()["token"]
+
+        weightage.marks_weightage = 60
+        weightage.save()
+
+        data = self.sync(token)
+        self.assertEqual(self.updated(data, "subject", "subject_code"), ["S1"])
+        self.assertEqual(
+            data["changes"]["subject"]["updated"][0]["weightage"][0]["marks_weightage"],
+            60,
+        )
+
+    @override_settings(CACHE_IS_SHARED=True)
+    def test_unchanged_poll(self):
+        token = self.sync()["token"]
+        url = f"{reverse('sync')}?since={token}"
+        etag = self.client.get(url, **self.headers)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, 304)
+
+    def test_tokens(self):
+        response = self.client.get(reverse("sync"), {"since": "abc"}, **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+        with override_settings(SYNC_TOMBSTONE_RETENTION=60):
+            self.assertTrue(self.sync("2020-01-01T00:00:00")["reset"])
+
+    def test_prune_tombstones(self):
+        Tombstone.objects.create(
+            model="data.batch", object_pk="1", deleted_at=datetime(2020, 1, 1)
+        )
+        Batch.objects.first().delete()
+
+        call_command("prune_tombstones", stdout=StringIO())
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+
+class ValuesSerializerTestCase(APITestCase):
+    def assertSameData(self, serializer_class, queryset):
+        self.assertEqual(
+            values_serializer(serializer_class).serialize(queryset),
+            serializer_class(queryset, many=True).data,
+        )
+
+    def test_matches_serializer_output(self):
+        self.create_students(3)
+        StudentDetail.objects.filter(enrolment_no="990000001").update(
+            middle_name="mname"
+        )
+
+        self.assertSameData(StudentDetailSupportSerializer, StudentDetail.objects.all())
+        self.assertSameData(StaffDetailSupportSerializer, StaffDetail.objects.all())
+        self.assertSameData(BranchSupportSerializer, Branch.objects.all())
+        self.assertSameData(DepartmentSupportSerializer, Department.objects.all())
+
+    def test_single_query(self):
+        self.create_students(3)
+        serializer = values_serializer(StudentDetailSupportSerializer)
+        with self.assertNumQueries(1):
+            serializer.serialize(StudentDetail.objects.all())
+
+    def test_rejects_fields_without_column(self):
+        with self.assertRaises(ImproperlyConfigured):
+            values_serializer(StudentDetailBranchSerializer)
+        with self.assertRaises(ImproperlyConfigured):
+            values_serializer(BatchSerializer)
+
+
+class BatchAPITestCase(APITestCase):
+    def test_constant_query_count(self):
+        self.create_students(20)
+        students = list(StudentDetail.objects.all())
+        allocations = list(FacultyAllocation.objects.all())
+        department = Department.objects.first()
+        for number in range(3, 23):
+            batch = Batch.objects.create(name=f"B{number}")
+            batch.faculty.add(*allocations)
+            batch.student.add(*students)
+            department.batch.add(batch)
+
+        # batches, allocations with faculty and subject, students with branch
+        # and departments
+        with self.assertNumQueries(4):
+            batches = self.get_json(reverse("batch-list"))
+
+        self.assertEqual(len(batches), 22)
+        batch = next(batch for batch in batches if batch["name"] == "B3")
+        self.assertEqual(len(batch["faculty"]), len(allocations))
+        self.assertEqual(len(batch["student"]), len(students))
+        self.assertEqual(batch["department"]["id"], department.id)
+        self.assertEqual(
+            {allocation["faculty_short_name"] for allocation in batch["faculty"]},
+            set(
+                FacultyAllocation.objects.values_list("faculty__short_name", flat=True)
+            ),
+        )
+
+    def test_paginated_query_count(self):
+        with self.assertNumQueries(4):
+            page = self.get_json(f"{reverse('batch-list')}?page_size=1")
+        self.assertEqual(len(page["results"]), 1)
+
+
+class OwnDepartmentAPITestCase(APITestCase):
+    def test_locked_department_hidden_from_issued_token(self):
+        user = User.objects.create(
+            username="staff3", email="staff3@ljku.edu.in", first_name="fname3"
+        )
+        access = RoleTokenObtainPairSerializer.get_token(user).access_token
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+
+        response = self.client.get(reverse("own-department-list"), **headers)
+        self.assertEqual([department["id"] for department in response.json()], [1])
+
+        department = Department.objects.get(pk=1)
+        department.locked = True
+        department.save()
+
+        response = self.client.get(reverse("own-department-list"), **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
@@ -7,11 +7,14 @@ from .views import (
     DepartmentAPI,
     FacultyAllocationAPI,
     OwnDepartmentAPI,
+    SearchAPI,
     StaffDetailAPI,
     StaffDetailCompactAPI,
     StudentDetailAPI,
     StudentDetailCompactAPI,
+    StudentImportAPI,
     SubjectWeightageAPI,
+    SyncAPI,
 )
 
 urlpatterns = [
@@ -29,6 +32,7 @@ urlpatterns = [
         StudentDetailCompactAPI.as_view(),
         name="student-compact-list",
     ),
+    path("v1/student/import/", StudentImportAPI.as_view(), name="student-import"),
     path(
         "v1/faculty-allocation/",
         FacultyAllocationAPI.as_view(),
@@ -36,4 +40,6 @@ urlpatterns = [
     ),
     path("v1/subject/", SubjectWeightageAPI.as_view(), name="subject-list"),
     path("v1/batch/", BatchAPI.as_view(), name="batch-list"),
+    path("v1/search/", SearchAPI.as_view(), name="search"),
+    path("v1/sync/", SyncAPI.as_view(), name="sync"),
 ]
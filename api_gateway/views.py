@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
@@ -9,6 +11,8 @@ from authentication.permission_classes import (
     IsAdmin,
     IsHOD,
 )
+from authentication.principal import get_principal
+from data.imports import StudentImportError, import_format, import_students
 from data.models import (
     Batch,
     Branch,
@@ -20,7 +24,14 @@ from data.models import (
     Subject,
     Weightage,
 )
-
+from data.permissions import coalesce_permission_writes
+from data.sync import SYNCED_MODELS
+
+from .bulk import BulkUpsertMixin
+from .conditional import versioned
+from .pagination import KeysetPaginationMixin, SearchPagination
+from .response_cache import cached_response
+from .search import search
 from .serializers import (
     BatchSerializer,
     BatchSupportSerializer,
@@ -31,22 +42,24 @@ from .serializers import (
     FacultyAllocationSerializer,
     StaffDetailSerializer,
     StaffDetailSupportSerializer,
+    StudentDetailBranchSerializer,
     StudentDetailSerializer,
     StudentDetailSupportSerializer,
     StudyResourceSerializer,
     SubjectSerializer,
     WeightageSerializer,
+    values_serializer,
 )
-from .utils import get_email_from_access_token
+from .sync import parse_token, sync
 
 
-class StaffDetailAPI(APIView):
+class StaffDetailAPI(BulkUpsertMixin, KeysetPaginationMixin, APIView):
     permission_classes = [IsAdmin]
 
+    @versioned(StaffDetail)
     def get(self, request):
         staff_details = StaffDetail.objects.all()
-        serializer = StaffDetailSerializer(staff_details, many=True)
-        return Response(serializer.data)
+        return self.list_response(staff_details, StaffDetailSerializer)
 
     def post(self, request):
         serializer = StaffDetailSerializer(data=request.data)
@@ -56,6 +69,9 @@ class StaffDetailAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def put(self, request):
+        if isinstance(request.data, list):
+            return self.bulk_upsert_response(request.data, StaffDetailSerializer)
+
         email = request.data.get("email")
 
         try:
@@ -73,19 +89,21 @@ class StaffDetailAPI(APIView):
 class StaffDetailCompactAPI(APIView):
     permission_classes = [IsAdmin]
 
+    @versioned(StaffDetail)
+    @cached_response(StaffDetail)
     def get(self, request):
         staff_details = StaffDetail.objects.filter(active=True)
-        serializer = StaffDetailSupportSerializer(staff_details, many=True)
-        return Response(serializer.data)
+        serializer = values_serializer(StaffDetailSupportSerializer)
+        return Response(serializer.serialize(staff_details))
 
 
-class BranchAPI(APIView):
+class BranchAPI(KeysetPaginationMixin, APIView):
     permission_classes = [IsAdmin]
 
+    @versioned(Branch)
     def get(self, request):
         branches = Branch.objects.all()
-        serializer = BranchSerializer(branches, many=True)
-        return Response(serializer.data)
+        return self.list_response(branches, BranchSerializer)
 
     def post(self, request):
         serializer = BranchSerializer(data=request.data)
@@ -109,21 +127,14 @@ class BranchAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class StudentDetailAPI(APIView):
+class StudentDetailAPI(BulkUpsertMixin, KeysetPaginationMixin, APIView):
     permission_classes = [IsAdmin]
+    stream_list = True
 
+    @versioned(StudentDetail, Branch)
     def get(self, request):
-        student_details = StudentDetail.objects.all()
-        serializer = StudentDetailSerializer(student_details, many=True)
-        serialized_data = serializer.data
-
-        for data in serialized_data:
-            branch_code = data["branch"]
-            branch_instance = Branch.objects.get(branch_code=branch_code)
-            branch_serializer = BranchSupportSerializer(branch_instance)
-            data["branch"] = branch_serializer.data
-
-        return Response(serialized_data)
+        student_details = StudentDetail.objects.select_related("branch")
+        return self.list_response(student_details, StudentDetailBranchSerializer)
 
     def post(self, request):
         serializer = StudentDetailSerializer(data=request.data)
@@ -134,6 +145,9 @@ class StudentDetailAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def put(self, request):
+        if isinstance(request.data, list):
+            return self.bulk_upsert_response(request.data, StudentDetailSerializer)
+
         email = request.data.get("email")
 
         try:
@@ -149,22 +163,45 @@ class StudentDetailAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class StudentImportAPI(APIView):
+    permission_classes = [IsAdmin]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": ["No file was submitted."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            report = import_students(upload, import_format(upload.name))
+        except StudentImportError as e:
+            return Response({"file": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        if report["errors"] and not report["created"]:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED)
+
+
 class StudentDetailCompactAPI(APIView):
     permission_classes = [IsAdmin]
 
+    @versioned(StudentDetail, Branch)
+    @cached_response(StudentDetail, Branch)
     def get(self, request, format=None):
         students = StudentDetail.objects.filter(graduated=False)
-        serializer = StudentDetailSupportSerializer(students, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = values_serializer(StudentDetailSupportSerializer)
+        return Response(serializer.serialize(students), status=status.HTTP_200_OK)
 
 
-class FacultyAllocationAPI(APIView):
+class FacultyAllocationAPI(KeysetPaginationMixin, APIView):
     permission_classes = [IsAdmin]
 
+    @versioned(FacultyAllocation, StaffDetail, Subject)
     def get(self, request):
-        allocations = FacultyAllocation.objects.all()
-        serializer = FacultyAllocationSerializer(allocations, many=True)
-        return Response(serializer.data)
+        allocations = FacultyAllocation.objects.select_related("faculty", "subject")
+        return self.list_response(allocations, FacultyAllocationSerializer)
 
     def post(self, request):
         faculty_id = request.data.get("faculty")
@@ -210,11 +247,11 @@ class FacultyAllocationAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SubjectWeightageAPI(APIView):
+class SubjectWeightageAPI(KeysetPaginationMixin, APIView):
+    @versioned(Subject, Weightage)
     def get(self, request):
-        subjects = Subject.objects.all()
-        serializer = SubjectSerializer(subjects, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        subjects = Subject.objects.prefetch_related("weightage")
+        return self.list_response(subjects, SubjectSerializer)
 
     def post(self, request):
         subject_serializer = SubjectSerializer(data=request.data)
@@ -273,19 +310,39 @@ class SubjectWeightageAPI(APIView):
         return Response(subject_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class BatchAPI(APIView):
+class BatchAPI(KeysetPaginationMixin, APIView):
     permission_classes = [IsAdmin | IsHOD]
-
+    stream_list = True
+
+    @versioned(
+        Batch,
+        Department,
+        FacultyAllocation,
+        StaffDetail,
+        Subject,
+        StudentDetail,
+        Branch,
+    )
     def get(self, request):
-        email = get_email_from_access_token(request)
-        staff_obj = StaffDetail.objects.filter(email=email, admin=True)
-        if staff_obj:
+        principal = get_principal(request)
+        if principal.is_admin:
             batches = Batch.objects.all()
         else:
-            batches = Batch.objects.filter(department__hod__email=email)
-        serializer = BatchSerializer(batches, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
+            batches = Batch.objects.filter(department__hod__email=principal.email)
+
+        batches = batches.prefetch_related(
+            Prefetch(
+                "faculty",
+                queryset=FacultyAllocation.objects.select_related("faculty", "subject"),
+            ),
+            Prefetch(
+                "student", queryset=StudentDetail.objects.select_related("branch")
+            ),
+            "department_set",
+        )
+        return self.list_response(batches, BatchSerializer)
+
+    @coalesce_permission_writes()
     def post(self, request):
         if "faculty" in request.data and not request.data["faculty"]:
             del request.data["faculty"]
@@ -311,6 +368,7 @@ class BatchAPI(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @coalesce_permission_writes()
     def put(self, request):
         id = request.data.get("id")
         name = request.data.get("name")
@@ -333,31 +391,55 @@ class BatchAPI(APIView):
 class OwnDepartmentAPI(APIView):
     permission_classes = [IsAdmin | IsHOD]
 
+    @versioned(Department)
     def get(self, request):
-        email = get_email_from_access_token(request)
-        staff_obj = StaffDetail.objects.filter(email=email, admin=True)
-        if staff_obj:
+        principal = get_principal(request)
+        if principal.is_admin:
             own_department = Department.objects.filter(locked=False)
         else:
-            own_department = Department.objects.filter(hod__email=email, locked=False)
-        serializer = DepartmentSupportSerializer(own_department, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            own_department = Department.objects.filter(
+                id__in=principal.hod_departments, locked=False
+            )
+        serializer = values_serializer(DepartmentSupportSerializer)
+        return Response(serializer.serialize(own_department), status=status.HTTP_200_OK)
 
 
 class BranchCompactAPI(APIView):
+    @versioned(Branch)
+    @cached_response(Branch)
     def get(self, request):
         branches = Branch.objects.filter(available=True)
-        serializer = BranchSupportSerializer(branches, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = values_serializer(BranchSupportSerializer)
+        return Response(serializer.serialize(branches), status=status.HTTP_200_OK)
 
 
-class DepartmentAPI(APIView):
+class DepartmentAPI(KeysetPaginationMixin, APIView):
     permission_classes = [IsAdmin]
 
+    @versioned(Department, Batch, Branch, StaffDetail)
     def get(self, request):
-        departments = Department.objects.all()
-        serializer = DepartmentSerializer(departments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        departments = (
+            Department.objects.select_related("hod")
+            .only(
+                "id",
+                "year",
+                "semester",
+                "name",
+                "locked",
+                "hod__email",
+                "hod__first_name",
+                "hod__middle_name",
+                "hod__last_name",
+            )
+            .prefetch_related(
+                Prefetch("batch", queryset=Batch.objects.only("id", "name")),
+                Prefetch(
+                    "branch",
+                    queryset=Branch.objects.only("branch_code", "branch_short_name"),
+                ),
+            )
+        )
+        return self.list_response(departments, DepartmentSerializer)
 
     def post(self, request):
         if "branch" in request.data and not request.data["branch"]:
@@ -376,6 +458,7 @@ class DepartmentAPI(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @coalesce_permission_writes()
     def put(self, request):
         id = request.data.get("id")
         name = request.data.get("name")
@@ -390,3 +473,39 @@ class DepartmentAPI(APIView):
             department.branch.set(branches)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SearchAPI(APIView):
+    permission_classes = [IsAdmin]
+    pagination_class = SearchPagination
+
+    @versioned(StudentDetail, StaffDetail, Branch)
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        min_length = getattr(settings, "SEARCH_MIN_LENGTH", 3)
+        if len(query) < min_length:
+            return Response(
+                {"q": [f"Ensure this field has at least {min_length} characters."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        paginator = self.pagination_class()
+        offset, limit = paginator.get_window(request)
+        return paginator.get_paginated_response(search(query, offset, limit))
+
+
+class SyncAPI(APIView):
+    permission_classes = [IsAdmin]
+
+    @versioned(*SYNCED_MODELS)
+    def get(self, request):
+        since = request.query_params.get("since")
+        if since:
+            try:
+                since = parse_token(since)
+            except ValueError:
+                return Response(
+                    {"since": ["Invalid sync token."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        return Response(sync(since or None))
@@ -1,35 +1,35 @@
 from rest_framework import permissions, status
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 
 from data.models import StaffDetail, StudentDetail, StudentSemesterRecord
 
+from .principal import get_principal
+from .token_cache import get_validated_token
+
 
 class IsAuthenticatedWithToken(BaseAuthentication):
+    # Stateless authentication returns a TokenUser backed by the token claims
+    # instead of loading the user from the database.
+    stateless = False
+
     def authenticate(self, request):
-        auth_header = request.headers.get("Authorization")
+        principal = get_principal(request)
 
-        if auth_header is None:
+        if principal is None:
             return None
 
-        auth_token = auth_header.split(" ")
-
-        if len(auth_token) != 2 or auth_token[0] != "Bearer":
-            raise AuthenticationFailed(
-                "Invalid authorization header.", code="invalid_auth_header"
-            )
+        if self.stateless:
+            return (principal.token_user, principal.token)
 
-        token = auth_token[1]
+        return (principal.user, None)
 
-        try:
-            jwt_authentication = JWTAuthentication()
-            validated_token = jwt_authentication.get_validated_token(token)
 
-            user = jwt_authentication.get_user(validated_token)
+class IsAuthenticatedWithStatelessToken(IsAuthenticatedWithToken):
+    stateless = True
 
-            return (user, None)
 
-        except AuthenticationFailed:
-            raise
-        return None
+class CachedJWTStatelessUserAuthentication(JWTStatelessUserAuthentication):
+    def get_validated_token(self, raw_token):
+        return get_validated_token(raw_token)
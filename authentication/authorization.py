@@ -0,0 +1,56 @@
+from functools import lru_cache
+
+from data.models import StaffDetail
+
+from .claims import get_permissions_version
+
+
+def compile_permission_index(permissions):
+    """
+    Flattens a StaffDetail.permissions tree
+    (year -> semester -> department -> batch -> resource -> action flags)
+    into a set of (year, semester, department, batch, resource, action)
+    tuples holding every granted action.
+    """
+    return frozenset(
+        (year, semester, department, batch, resource, action)
+        for year, semesters in (permissions or {}).items()
+        for semester, departments in semesters.items()
+        for department, batches in departments.items()
+        for batch, resources in batches.items()
+        for resource, actions in resources.items()
+        for action, granted in actions.items()
+        if granted
+    )
+
+
+@lru_cache(maxsize=4096)
+def get_permission_index(email, version):
+    """
+    Returns the compiled permission index of a staff member. Entries are
+    keyed by permissions version, which is bumped whenever the stored
+    permission tree changes, so a stale index is never served for a newer
+    version.
+    """
+    permissions = (
+        StaffDetail.objects.filter(email=email)
+        .values_list("permissions", flat=True)
+        .first()
+    )
+    return compile_permission_index(permissions)
+
+
+def clear_permission_index_cache():
+    get_permission_index.cache_clear()
+
+
+def has_perm(staff, scope, resource, action):
+    """
+    Returns whether staff may perform action on resource within scope, a
+    (year, semester, department name, batch name) tuple. staff is either a
+    StaffDetail or a request Principal. With a shared cache, the index is
+    resolved without any query once it is cached.
+    """
+    version = get_permissions_version(staff.email)
+    key = tuple(str(part) for part in scope) + (resource, action)
+    return key in get_permission_index(staff.email, version)
@@ -0,0 +1,141 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from data.models import Department, StaffDetail, StudentDetail
+from data.versions import cache_is_shared
+
+from .models import AuthorizationVersion
+
+EMAIL_CLAIM = "email"
+ROLE_CLAIM = "role"
+ROLES_CLAIM = "roles"
+HOD_DEPARTMENTS_CLAIM = "hod_departments"
+AUTHZ_VERSION_CLAIM = "authz_version"
+
+PERMISSIONS_VERSION_CACHE_KEY = "permissions-version:{}"
+
+
+def get_authorization_version(email):
+    version = (
+        AuthorizationVersion.objects.filter(email=email)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_authorization_version(emails):
+    """
+    Invalidates the role claims of every given user. Tokens issued before the
+    bump are rejected at refresh, forcing a fresh login with current claims.
+    """
+    emails = set(email for email in emails if email)
+    if not emails:
+        return
+
+    versions = AuthorizationVersion.objects.filter(email__in=emails)
+    existing = set(versions.values_list("email", flat=True))
+    versions.update(version=F("version") + 1)
+
+    AuthorizationVersion.objects.bulk_create(
+        [AuthorizationVersion(email=email, version=1) for email in emails - existing],
+        ignore_conflicts=True,
+    )
+
+
+def get_permissions_version(email):
+    """
+    Returns the version of a staff member's permission tree, from the shared
+    cache when there is one and from the database otherwise. Unlike the
+    authorization version it isn't carried in tokens, so a change reaches
+    requests made with tokens issued before it.
+    """
+    shared = cache_is_shared()
+    key = PERMISSIONS_VERSION_CACHE_KEY.format(email)
+    if shared:
+        version = cache.get(key)
+        if version is not None:
+            return version
+
+    version = (
+        AuthorizationVersion.objects.filter(email=email)
+        .values_list("permissions_version", flat=True)
+        .first()
+    )
+    if shared:
+        # add() never overwrites the value published by a concurrent bump
+        cache.add(key, version or 0, timeout=None)
+    return version or 0
+
+
+def bump_permissions_version(emails):
+    """
+    Retires the compiled permission indexes of every given staff member. Their
+    tokens stay valid, no role claim depends on the permission tree.
+    """
+    emails = set(email for email in emails if email)
+    if not emails:
+        return
+
+    versions = AuthorizationVersion.objects.filter(email__in=emails)
+    existing = set(versions.values_list("email", flat=True))
+    versions.update(permissions_version=F("permissions_version") + 1)
+
+    AuthorizationVersion.objects.bulk_create(
+        [
+            AuthorizationVersion(email=email, permissions_version=1)
+            for email in emails - existing
+        ],
+        ignore_conflicts=True,
+    )
+
+    if cache_is_shared():
+
+        def publish():
+            cache.set_many(
+                {
+                    PERMISSIONS_VERSION_CACHE_KEY.format(email): version
+                    for email, version in AuthorizationVersion.objects.filter(
+                        email__in=emails
+                    ).values_list("email", "permissions_version")
+                },
+                timeout=None,
+            )
+
+        # Other connections only see the new trees once this commits
+        transaction.on_commit(publish)
+
+
+def resolve_authorization(email):
+    """
+    Returns the role claims of a user: every role held, the primary role (the
+    one shown on the profile), the unlocked departments the user heads and the
+    authorization version the claims were computed at.
+    """
+    roles = []
+
+    staff = StaffDetail.objects.filter(email=email).values("admin", "active").first()
+    if staff and staff.get("admin"):
+        roles.append("admin")
+
+    hod_departments = list(
+        Department.objects.filter(locked=False, hod__email=email).values_list(
+            "id", flat=True
+        )
+    )
+    if hod_departments:
+        roles.append("hod")
+
+    if staff and staff.get("active"):
+        roles.append("staff")
+
+    if StudentDetail.objects.filter(email=email, graduated=False).exists():
+        roles.append("student")
+
+    return {
+        ROLE_CLAIM: roles[0] if roles else "guest",
+        ROLES_CLAIM: roles,
+        HOD_DEPARTMENTS_CLAIM: hod_departments,
+        AUTHZ_VERSION_CLAIM: get_authorization_version(email),
+    }
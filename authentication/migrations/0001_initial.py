@@ -0,0 +1,38 @@
+# Generated by Django 4.1.10 on 2026-10-18 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthorizationVersion",
+            fields=[
+                (
+                    "email",
+                    models.EmailField(
+                        max_length=100,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Email",
+                    ),
+                ),
+                (
+                    "version",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Bumped whenever the roles or scopes of the user change.",
+                        verbose_name="Version",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Authorization Version",
+                "verbose_name_plural": "Authorization Versions",
+            },
+        ),
+    ]
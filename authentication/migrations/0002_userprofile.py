@@ -0,0 +1,69 @@
+# Generated by Django 4.1.10 on 2026-10-18 20:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def store_profile_photos(apps, schema_editor):
+    SocialAccount = apps.get_model("socialaccount", "SocialAccount")
+    UserProfile = apps.get_model("authentication", "UserProfile")
+
+    UserProfile.objects.bulk_create(
+        [
+            UserProfile(user_id=user_id, profile_photo=extra_data.get("picture"))
+            for user_id, extra_data in SocialAccount.objects.filter(
+                provider="google"
+            ).values_list("user_id", "extra_data")
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("authentication", "0001_initial"),
+        ("socialaccount", "0003_extra_data_default_dict"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "profile_photo",
+                    models.URLField(
+                        blank=True,
+                        help_text="Picture of the user's Google account, stored at social login.",
+                        max_length=500,
+                        null=True,
+                        verbose_name="Profile Photo",
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="profile",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "User Profile",
+                "verbose_name_plural": "User Profiles",
+            },
+        ),
+        migrations.RunPython(store_profile_photos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.10 on 2026-10-18 21:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authentication", "0002_userprofile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="authorizationversion",
+            name="permissions_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Bumped whenever the permission tree of the staff member changes.",
+                verbose_name="Permissions Version",
+            ),
+        ),
+    ]
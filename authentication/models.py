@@ -1,3 +1,50 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class AuthorizationVersion(models.Model):
+    email = models.EmailField(
+        primary_key=True,
+        max_length=100,
+        verbose_name="Email",
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Version",
+        help_text="Bumped whenever the roles or scopes of the user change.",
+    )
+    permissions_version = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Permissions Version",
+        help_text="Bumped whenever the permission tree of the staff member changes.",
+    )
+
+    class Meta:
+        verbose_name_plural = "Authorization Versions"
+        verbose_name = "Authorization Version"
+
+    def __str__(self):
+        return f"{self.email} v{self.version}"
+
+
+class UserProfile(models.Model):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="profile",
+        verbose_name="User",
+    )
+    profile_photo = models.URLField(
+        max_length=500,
+        null=True,
+        blank=True,
+        verbose_name="Profile Photo",
+        help_text="Picture of the user's Google account, stored at social login.",
+    )
+
+    class Meta:
+        verbose_name_plural = "User Profiles"
+        verbose_name = "User Profile"
+
+    def __str__(self):
+        return f"{self.user}"
@@ -1,51 +1,58 @@
 from rest_framework.permissions import BasePermission
 
-from data.models import Department, StaffDetail, StudentDetail
-
-from .authentication_classes import IsAuthenticatedWithToken
+from .authorization import has_perm
+from .principal import get_principal
 
 
 class IsActiveStudent(BasePermission):
     def has_permission(self, request, view):
-        user, auth = IsAuthenticatedWithToken().authenticate(request)
-
-        if user and user.is_authenticated:
-            student_obj = StudentDetail.objects.filter(
-                email=user.email, graduated=False
-            )
-            return bool(student_obj)
-
-        return False
+        principal = get_principal(request)
+        return bool(principal and principal.is_active_student)
 
 
 class IsActiveStaff(BasePermission):
     def has_permission(self, request, view):
-        user, auth = IsAuthenticatedWithToken().authenticate(request)
-
-        if user and user.is_authenticated:
-            staff_data = StaffDetail.objects.filter(email=user.email, active=True)
-            return bool(staff_data)
-
-        return False
+        principal = get_principal(request)
+        return bool(principal and principal.is_active_staff)
 
 
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
-        user, auth = IsAuthenticatedWithToken().authenticate(request)
-
-        if user and user.is_authenticated:
-            staff_data = StaffDetail.objects.filter(email=user.email, admin=True)
-            return bool(staff_data)
-
-        return False
+        principal = get_principal(request)
+        return bool(principal and principal.is_admin)
 
 
 class IsHOD(BasePermission):
     def has_permission(self, request, view):
-        user, auth = IsAuthenticatedWithToken().authenticate(request)
+        principal = get_principal(request)
+        return bool(principal and principal.is_hod)
+
+
+class HasScopedPermission(BasePermission):
+    """
+    Authorizes against the caller's compiled permission index. The view names
+    the resource in `permission_resource` and returns the
+    (year, semester, department, batch) scope from `get_permission_scope`.
+    """
+
+    METHOD_ACTIONS = {
+        "GET": "read",
+        "HEAD": "read",
+        "OPTIONS": "read",
+        "POST": "create",
+        "PUT": "update",
+        "PATCH": "update",
+        "DELETE": "delete",
+    }
+
+    def has_permission(self, request, view):
+        principal = get_principal(request)
+        if principal is None:
+            return False
 
-        if user and user.is_authenticated:
-            departments = Department.objects.filter(locked=False, hod__email=user.email)
-            return bool(departments)
+        scope = view.get_permission_scope(request)
+        action = self.METHOD_ACTIONS.get(request.method)
+        if scope is None or action is None:
+            return False
 
-        return False
+        return has_perm(principal, scope, view.permission_resource, action)
@@ -0,0 +1,113 @@
+from functools import cached_property
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from data.models import Department, StaffDetail, StudentDetail
+
+from .claims import AUTHZ_VERSION_CLAIM, EMAIL_CLAIM, HOD_DEPARTMENTS_CLAIM, ROLES_CLAIM
+from .token_cache import get_validated_token
+
+
+class Principal:
+    """
+    The caller behind an authenticated request.
+
+    The access token is decoded once per request, and everything derived from
+    it (the user, the staff and student rows, the HOD departments) is loaded
+    lazily and memoized, so the authentication class, every permission class
+    and the view share the same lookups. Tokens carrying the email and role
+    claims answer the role checks without touching the database at all.
+    """
+
+    def __init__(self, validated_token):
+        self.token = validated_token
+        self.has_claims = AUTHZ_VERSION_CLAIM in validated_token
+
+    @cached_property
+    def user(self):
+        return JWTAuthentication().get_user(self.token)
+
+    @cached_property
+    def token_user(self):
+        return api_settings.TOKEN_USER_CLASS(self.token)
+
+    @cached_property
+    def email(self):
+        if EMAIL_CLAIM in self.token:
+            return self.token[EMAIL_CLAIM]
+        return self.user.email
+
+    @cached_property
+    def staff(self):
+        return StaffDetail.objects.defer("permissions").filter(email=self.email).first()
+
+    @cached_property
+    def student(self):
+        return StudentDetail.objects.filter(email=self.email).first()
+
+    @cached_property
+    def hod_departments(self):
+        if self.has_claims:
+            return set(self.token[HOD_DEPARTMENTS_CLAIM])
+
+        return set(
+            Department.objects.filter(locked=False, hod__email=self.email).values_list(
+                "id", flat=True
+            )
+        )
+
+    @property
+    def is_admin(self):
+        if self.has_claims:
+            return "admin" in self.token[ROLES_CLAIM]
+        return bool(self.staff and self.staff.admin)
+
+    @property
+    def is_hod(self):
+        return bool(self.hod_departments)
+
+    @property
+    def is_active_staff(self):
+        if self.has_claims:
+            return "staff" in self.token[ROLES_CLAIM]
+        return bool(self.staff and self.staff.active)
+
+    @property
+    def is_active_student(self):
+        if self.has_claims:
+            return "student" in self.token[ROLES_CLAIM]
+        return bool(self.student and not self.student.graduated)
+
+
+def get_principal(request):
+    """
+    Returns the Principal of the request, or None when no Authorization header
+    was sent. The result is cached on the underlying HttpRequest so it is
+    shared between DRF's Request wrapper and the view.
+    """
+    http_request = getattr(request, "_request", request)
+
+    try:
+        return http_request._principal
+    except AttributeError:
+        pass
+
+    auth_header = http_request.headers.get("Authorization")
+
+    if auth_header is None:
+        principal = None
+    else:
+        auth_token = auth_header.split(" ")
+
+        if len(auth_token) != 2 or auth_token[0] != "Bearer":
+            raise AuthenticationFailed(
+                "Invalid authorization header.", code="invalid_auth_header"
+            )
+
+        validated_token = get_validated_token(auth_token[1])
+        principal = Principal(validated_token)
+
+    http_request._principal = principal
+    return principal
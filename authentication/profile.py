@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Subquery
+
+from data.models import Department, StaffDetail, StudentDetail
+
+from .models import UserProfile
+
+User = get_user_model()
+
+PROFILE_CACHE_KEY = "profile:{}"
+PROFILE_ROLES = ("admin", "hod", "staff", "student")
+
+
+def profile_cache_key(email):
+    return PROFILE_CACHE_KEY.format(email)
+
+
+def resolve_profile(**filters):
+    """
+    Loads the profile payload of the user matching filters in one query,
+    resolving the role with EXISTS subqueries in the same order as before:
+    admin, HOD, active staff, current student, guest.
+    """
+    email = OuterRef("email")
+    row = (
+        User.objects.filter(**filters)
+        .annotate(
+            role_admin=Exists(StaffDetail.objects.filter(email=email, admin=True)),
+            role_hod=Exists(Department.objects.filter(hod__email=email)),
+            role_staff=Exists(StaffDetail.objects.filter(email=email, active=True)),
+            role_student=Exists(
+                StudentDetail.objects.filter(email=email, graduated=False)
+            ),
+            profile_photo=Subquery(
+                UserProfile.objects.filter(user=OuterRef("pk")).values("profile_photo")[
+                    :1
+                ]
+            ),
+        )
+        .values(
+            "email",
+            "first_name",
+            "last_name",
+            "profile_photo",
+            "role_admin",
+            "role_hod",
+            "role_staff",
+            "role_student",
+        )
+        .first()
+    )
+    if row is None:
+        return None
+
+    roles = [role for role in PROFILE_ROLES if row.pop(f"role_{role}")]
+    return {**row, "role": roles[0] if roles else "guest"}
+
+
+def get_profile(email, **filters):
+    """
+    Returns the cached profile payload of email, loading it with
+    resolve_profile(**filters) on a miss.
+    """
+    key = profile_cache_key(email)
+    profile = cache.get(key)
+    if profile is None:
+        profile = resolve_profile(**filters)
+        if profile is not None:
+            cache.set(key, profile, getattr(settings, "PROFILE_CACHE_TIMEOUT", 60))
+    return profile
+
+
+def invalidate_profiles(emails):
+    cache.delete_many([profile_cache_key(email) for email in emails if email])
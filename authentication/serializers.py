@@ -1,6 +1,19 @@
-from allauth.socialaccount.models import SocialAccount
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from .claims import (
+    AUTHZ_VERSION_CLAIM,
+    EMAIL_CLAIM,
+    get_authorization_version,
+    resolve_authorization,
+)
+from .models import UserProfile
 
 User = get_user_model()
 
@@ -13,7 +26,38 @@ class UserSerializer(serializers.Serializer):
 
     def get_profile_photo(self, user):
         try:
-            google_account = SocialAccount.objects.get(user=user, provider="google")
-            return google_account.extra_data.get("picture")
-        except SocialAccount.DoesNotExist:
+            return user.profile.profile_photo
+        except UserProfile.DoesNotExist:
             return None
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[EMAIL_CLAIM] = user.email
+
+        for claim, value in resolve_authorization(user.email).items():
+            token[claim] = value
+
+        return token
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        email = refresh.get(EMAIL_CLAIM)
+        if email is None:
+            email = (
+                User.objects.filter(
+                    **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}
+                )
+                .values_list("email", flat=True)
+                .first()
+            )
+
+        if refresh.get(AUTHZ_VERSION_CLAIM) != get_authorization_version(email):
+            raise InvalidToken("Token roles are out of date, please log in again.")
+
+        return super().validate(attrs)
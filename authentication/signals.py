@@ -0,0 +1,49 @@
+from allauth.socialaccount.models import SocialAccount
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from data.models import Department, StaffDetail, StudentDetail
+
+from .models import UserProfile
+from .profile import invalidate_profiles
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=SocialAccount)
+def store_profile_photo(sender, instance, raw=False, **kwargs):
+    if raw or instance.provider != "google":
+        return
+
+    UserProfile.objects.update_or_create(
+        user_id=instance.user_id,
+        defaults={"profile_photo": instance.extra_data.get("picture")},
+    )
+    invalidate_profiles(
+        User.objects.filter(pk=instance.user_id).values_list("email", flat=True)
+    )
+
+
+# Profile cache invalidation
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=StaffDetail)
+@receiver(post_delete, sender=StaffDetail)
+@receiver(post_save, sender=StudentDetail)
+@receiver(post_delete, sender=StudentDetail)
+def invalidate_user_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.email])
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_hod_profile(sender, instance, created=False, **kwargs):
+    emails = {instance.hod_id}
+    if not created:
+        old_values = instance.get_loaded_values(("hod_id",))
+        if old_values:
+            emails.add(old_values["hod_id"])
+    invalidate_profiles(emails)
@@ -1,3 +1,321 @@
-from django.test import TestCase
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
+from allauth.socialaccount.models import SocialAccount
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api_gateway.utils import get_email_from_access_token
+from data.models import Batch, Department, StaffDetail, StudentDetail
+
+from .authentication_classes import IsAuthenticatedWithStatelessToken
+from .authorization import clear_permission_index_cache, has_perm
+from .claims import get_authorization_version
+from .permission_classes import HasScopedPermission, IsActiveStaff, IsAdmin, IsHOD
+from .principal import get_principal
+from .serializers import RoleTokenObtainPairSerializer
+from .token_cache import ValidatedTokenCache, get_validated_token
+
+User = get_user_model()
+
+
+class PrincipalTestCase(TestCase):
+    fixtures = [
+        "data/test_fixtures/PermissionAutomationTestCase.json",
+    ]
+
+    def setUp(self):
+        StaffDetail.objects.filter(email="staff1@ljku.edu.in").update(admin=True)
+        self.user = User.objects.create(
+            username="staff1", email="staff1@ljku.edu.in", first_name="fname1"
+        )
+        self.token = str(AccessToken.for_user(self.user))
+
+    def get_request(self):
+        return APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def test_no_authorization_header(self):
+        request = APIRequestFactory().get("/")
+        self.assertIsNone(get_principal(request))
+        self.assertFalse(IsAdmin().has_permission(request, None))
+
+    def test_principal_is_shared_by_permission_classes(self):
+        request = self.get_request()
+
+        # user, staff row and HOD departments are each loaded once
+        with self.assertNumQueries(3):
+            self.assertTrue(IsAdmin().has_permission(request, None))
+            self.assertTrue(IsActiveStaff().has_permission(request, None))
+            self.assertFalse(IsHOD().has_permission(request, None))
+            self.assertTrue(IsAdmin().has_permission(request, None))
+
+        self.assertIs(get_principal(request), get_principal(request))
+        self.assertEqual(get_principal(request).email, "staff1@ljku.edu.in")
+
+    def test_batch_listing_reuses_principal(self):
+        response = self.client.get(
+            reverse("batch-list"), HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(b"".join(response.streaming_content))), 2)
+
+
+class RoleClaimsTestCase(TestCase):
+    fixtures = [
+        "data/test_fixtures/PermissionAutomationTestCase.json",
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username="staff3", email="staff3@ljku.edu.in", first_name="fname3"
+        )
+
+    def test_token_claims(self):
+        refresh = RoleTokenObtainPairSerializer.get_token(self.user)
+
+        self.assertEqual(refresh["role"], "hod")
+        self.assertEqual(refresh["roles"], ["hod", "staff"])
+        self.assertEqual(refresh["hod_departments"], [1])
+        self.assertEqual(refresh["authz_version"], 0)
+        self.assertEqual(refresh.access_token["roles"], ["hod", "staff"])
+
+    def test_permissions_from_claims(self):
+        access = RoleTokenObtainPairSerializer.get_token(self.user).access_token
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        with self.assertNumQueries(0):
+            self.assertFalse(IsAdmin().has_permission(request, None))
+            self.assertTrue(IsHOD().has_permission(request, None))
+            self.assertTrue(IsActiveStaff().has_permission(request, None))
+
+    def test_stale_token_rejected_at_refresh(self):
+        refresh = RoleTokenObtainPairSerializer.get_token(self.user)
+
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, 200)
+
+        department = Department.objects.get(pk=1)
+        department.locked = True
+        department.save()
+
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+        refresh = RoleTokenObtainPairSerializer.get_token(self.user)
+        self.assertEqual(refresh["roles"], ["staff"])
+        self.assertGreater(refresh["authz_version"], 0)
+
+    def test_unrelated_change_keeps_token(self):
+        refresh = RoleTokenObtainPairSerializer.get_token(self.user)
+
+        staff = StaffDetail.objects.get(email="staff3@ljku.edu.in")
+        staff.first_name = "renamed"
+        staff.save()
+
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, 200)
+
+
+class ValidatedTokenCacheTestCase(SimpleTestCase):
+    def test_lru_eviction(self):
+        cache = ValidatedTokenCache(maxsize=2)
+        expires_at = time.time() + 60
+
+        cache.set("a", {"exp": expires_at})
+        cache.set("b", {"exp": expires_at})
+        cache.get("a")
+        cache.set("c", {"exp": expires_at})
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_expired_entry(self):
+        cache = ValidatedTokenCache(maxsize=2)
+
+        cache.set("a", {"exp": time.time() - 1})
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class StatelessTokenTestCase(TestCase):
+    fixtures = [
+        "data/test_fixtures/PermissionAutomationTestCase.json",
+    ]
+
+    def setUp(self):
+        user = User.objects.create(
+            username="staff3", email="staff3@ljku.edu.in", first_name="fname3"
+        )
+        self.access = str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+
+    def get_request(self):
+        return APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def test_email_from_claim(self):
+        request = self.get_request()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_email_from_access_token(request), "staff3@ljku.edu.in")
+            user, token = IsAuthenticatedWithStatelessToken().authenticate(request)
+
+        self.assertEqual(user.email, "staff3@ljku.edu.in")
+        self.assertEqual(token["role"], "hod")
+
+    def test_verified_token_is_reused(self):
+        get_validated_token(self.access)
+
+        with mock.patch(
+            "authentication.token_cache.JWTAuthentication.get_validated_token"
+        ) as verify:
+            get_principal(self.get_request())
+            get_principal(self.get_request())
+
+        verify.assert_not_called()
+
+
+class AttendanceView:
+    permission_resource = "attendance"
+
+    def get_permission_scope(self, request):
+        return ("2024-25", "5", "DEPT_1", request.GET["batch"])
+
+
+class PermissionIndexTestCase(TestCase):
+    fixtures = [
+        "data/test_fixtures/PermissionAutomationTestCase.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        clear_permission_index_cache()
+
+    def get_request(self, method, batch):
+        user, _ = User.objects.get_or_create(
+            username="staff2", email="staff2@ljku.edu.in", first_name="fname2"
+        )
+        access = RoleTokenObtainPairSerializer.get_token(user).access_token
+        return getattr(APIRequestFactory(), method)(
+            f"/?batch={batch}", HTTP_AUTHORIZATION=f"Bearer {access}"
+        )
+
+    def test_has_perm(self):
+        staff1 = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+        scope = ("2024-25", 5, "DEPT_1", "B1")
+
+        self.assertTrue(has_perm(staff1, scope, "attendance", "read"))
+        self.assertFalse(has_perm(staff1, scope, "attendance", "update"))
+        self.assertFalse(
+            has_perm(staff1, ("2024-25", 5, "DEPT_1", "B2"), "attendance", "read")
+        )
+
+    def test_index_follows_permission_changes(self):
+        staff1 = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+        scope = ("2024-25", "5", "DEPT_1", "B1")
+        self.assertTrue(has_perm(staff1, scope, "mooc", "create"))
+
+        Batch.objects.get(name="B1").delete()
+
+        self.assertFalse(has_perm(staff1, scope, "mooc", "create"))
+
+    @override_settings(CACHE_IS_SHARED=True)
+    def test_scoped_permission_class(self):
+        permission = HasScopedPermission()
+
+        request = self.get_request("get", "B2")
+        self.assertTrue(permission.has_permission(request, AttendanceView()))
+
+        request = self.get_request("get", "B2")
+        with self.assertNumQueries(0):
+            self.assertTrue(permission.has_permission(request, AttendanceView()))
+
+        request = self.get_request("get", "B1")
+        self.assertFalse(permission.has_permission(request, AttendanceView()))
+
+        request = self.get_request("delete", "B2")
+        self.assertFalse(permission.has_permission(request, AttendanceView()))
+
+    @override_settings(CACHE_IS_SHARED=True)
+    def test_revocation_reaches_issued_tokens(self):
+        permission = HasScopedPermission()
+        request = self.get_request("get", "B2")
+        self.assertTrue(permission.has_permission(request, AttendanceView()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Batch.objects.get(name="B2").delete()
+
+        # The same token is refused, without having to be refreshed
+        self.assertFalse(permission.has_permission(request, AttendanceView()))
+        self.assertEqual(get_authorization_version("staff2@ljku.edu.in"), 0)
+
+
+class ProfileViewTestCase(TestCase):
+    fixtures = [
+        "data/test_fixtures/PermissionAutomationTestCase.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            username="staff3",
+            email="staff3@ljku.edu.in",
+            first_name="fname3",
+            last_name="lname3",
+        )
+        SocialAccount.objects.create(
+            user=self.user,
+            provider="google",
+            uid="3",
+            extra_data={"picture": "https://example.com/staff3.png"},
+        )
+        access = RoleTokenObtainPairSerializer.get_token(self.user).access_token
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+
+    def get_profile(self):
+        response = self.client.post(reverse("profile"), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_profile_is_cached(self):
+        with self.assertNumQueries(1):
+            profile = self.get_profile()
+
+        self.assertEqual(
+            profile,
+            {
+                "email": "staff3@ljku.edu.in",
+                "first_name": "fname3",
+                "last_name": "lname3",
+                "profile_photo": "https://example.com/staff3.png",
+                "role": "hod",
+            },
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_profile(), profile)
+
+    def test_profile_invalidation(self):
+        self.assertEqual(self.get_profile()["role"], "hod")
+
+        department = Department.objects.get(pk=1)
+        department.hod = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+        department.save()
+        self.assertEqual(self.get_profile()["role"], "staff")
+
+        StaffDetail.objects.get(email="staff3@ljku.edu.in").delete()
+        self.assertEqual(self.get_profile()["role"], "guest")
+
+        account = SocialAccount.objects.get(user=self.user)
+        account.extra_data = {"picture": "https://example.com/new.png"}
+        account.save()
+        self.assertEqual(
+            self.get_profile()["profile_photo"], "https://example.com/new.png"
+        )
@@ -0,0 +1,79 @@
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+class ValidatedTokenCache:
+    """
+    Process-local LRU of access tokens that already passed signature and
+    claim verification, keyed by the SHA-256 of the raw token. Entries are
+    dropped once the token's own `exp` has passed.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, raw_token):
+        key = self._key(raw_token)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            validated_token, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return validated_token
+
+    def set(self, raw_token, validated_token):
+        expires_at = validated_token.get("exp")
+        if expires_at is None or self.maxsize <= 0:
+            return
+
+        key = self._key(raw_token)
+
+        with self._lock:
+            self._entries[key] = (validated_token, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+validated_tokens = ValidatedTokenCache(getattr(settings, "JWT_TOKEN_CACHE_SIZE", 1024))
+
+
+def get_validated_token(raw_token):
+    """
+    Verifies a raw access token, skipping the signature check for tokens that
+    were verified before and have not expired yet.
+    """
+    validated_token = validated_tokens.get(raw_token)
+
+    if validated_token is None:
+        validated_token = JWTAuthentication().get_validated_token(raw_token)
+        validated_tokens.set(raw_token, validated_token)
+
+    return validated_token
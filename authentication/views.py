@@ -7,10 +7,9 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from data.models import Department, StaffDetail, StudentDetail
-
-from .authentication_classes import IsAuthenticatedWithToken
-from .serializers import UserSerializer
+from .authentication_classes import IsAuthenticatedWithStatelessToken
+from .principal import get_principal
+from .profile import get_profile
 
 
 class GoogleLoginView(SocialLoginView):
@@ -23,33 +22,16 @@ User = get_user_model()
 
 
 class ProfileView(APIView):
-    authentication_classes = [IsAuthenticatedWithToken]
+    authentication_classes = [IsAuthenticatedWithStatelessToken]
 
     def post(self, request, format=None):
         if request.user.is_authenticated:
-            user = request.user
-            serializer = UserSerializer(user)
-
-            email = user.email
-            role = None
-            print(email)
-            if StaffDetail.objects.filter(email=email, admin=True).exists():
-                role = "admin"
-            elif Department.objects.filter(hod__email=email).exists():
-                role = "hod"
-            elif StaffDetail.objects.filter(email=email, active=True).exists():
-                role = "staff"
-            elif StudentDetail.objects.filter(email=email, graduated=False).exists():
-                role = "student"
-
-            else:
-                role = "guest"
-
-            response_data = {
-                **serializer.data,
-                "role": role,
-            }
-
-            return Response(response_data)
+            principal = get_principal(request)
+            profile = get_profile(principal.email, pk=request.user.id)
+
+            if profile is None:
+                return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+            return Response(profile)
         else:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
@@ -10,6 +10,8 @@ from .models import (
     IndividualProject,
     MOOCCourse,
     MOOCResult,
+    PermissionGrant,
+    PermissionJob,
     RemedialTestResult,
     StaffDetail,
     StudentDetail,
@@ -17,6 +19,7 @@ from .models import (
     StudyResource,
     Subject,
     TestResult,
+    Tombstone,
     Weightage,
 )
 
@@ -51,6 +54,7 @@ class RollNoSearch:
 
 class StaffDetailAdmin(admin.ModelAdmin):
     search_fields = ["email", "short_name", "first_name", "last_name"]
+    readonly_fields = ["permissions"]
 
 
 class WeightageAdmin(admin.ModelAdmin):
@@ -129,6 +133,26 @@ class DepartmentAdmin(admin.ModelAdmin):
         return super().get_search_results(request, queryset, search_term)
 
 
+class PermissionGrantAdmin(admin.ModelAdmin):
+    search_fields = ["staff__email", "department__name", "batch__name"]
+    list_filter = ["role"]
+
+
+class PermissionJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "department",
+        "created_at",
+        "available_at",
+        "attempts",
+        "last_error",
+    ]
+
+
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ["model", "object_pk", "deleted_at"]
+    list_filter = ["model"]
+
+
 class AttendanceAdmin(RollNoSearch, admin.ModelAdmin):
     search_fields = [
         "studentsemesterrecord__student__enrolment_no",
@@ -218,6 +242,9 @@ admin.site.register(FacultyAllocation, FacultyAllocationAdmin)
 admin.site.register(Batch, BatchAdmin)
 admin.site.register(StudyResource, StudyResourceAdmin)
 admin.site.register(Department, DepartmentAdmin)
+admin.site.register(PermissionGrant, PermissionGrantAdmin)
+admin.site.register(PermissionJob, PermissionJobAdmin)
+admin.site.register(Tombstone, TombstoneAdmin)
 admin.site.register(Attendance, AttendanceAdmin)
 admin.site.register(RemedialTestResult, RemedialTestResultAdmin)
 admin.site.register(TestResult, TestResultAdmin)
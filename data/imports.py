@@ -0,0 +1,283 @@
+import csv
+import io
+import itertools
+import os
+import zipfile
+from datetime import date, datetime
+
+import openpyxl
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from authentication.claims import bump_authorization_version
+from authentication.profile import invalidate_profiles
+
+from .models import Branch, StudentDetail
+from .versions import bump_model_versions
+
+IMPORT_FORMATS = ("csv", "xlsx")
+
+# Columns of an import file, named after the StudentDetail fields. branch
+# holds the branch code, year_joined and graduated may be left out.
+REQUIRED_COLUMNS = (
+    "enrolment_no",
+    "email",
+    "first_name",
+    "last_name",
+    "gender",
+    "birth_date",
+    "mobile_number",
+    "branch",
+)
+TEXT_COLUMNS = (
+    "enrolment_no",
+    "email",
+    "first_name",
+    "middle_name",
+    "last_name",
+    "mobile_number",
+)
+
+MAX_LENGTHS = {
+    name: StudentDetail._meta.get_field(name).max_length for name in TEXT_COLUMNS
+}
+# The errors DRF's UniqueValidator reports for the unique fields
+UNIQUE_MESSAGES = {
+    name: StudentDetail._meta.get_field(name).error_messages["unique"]
+    % {
+        "model_name": StudentDetail._meta.verbose_name,
+        "field_label": StudentDetail._meta.get_field(name).verbose_name,
+    }
+    for name in ("enrolment_no", "email")
+}
+MOBILE_NUMBER_VALIDATOR = StudentDetail._meta.get_field("mobile_number").validators[0]
+
+# Gender codes and labels, in upper case, to codes
+GENDERS = {
+    key: code
+    for code, label in StudentDetail.GENDER_CHOICES
+    for key in (code, label.upper())
+}
+
+BOOLEAN_VALUES = {
+    "true": True,
+    "yes": True,
+    "1": True,
+    "false": False,
+    "no": False,
+    "0": False,
+}
+
+
+class StudentImportError(ValueError):
+    pass
+
+
+def import_format(name):
+    """Returns the import format of a file named name."""
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension not in IMPORT_FORMATS:
+        raise StudentImportError("Unsupported file type, upload a CSV or XLSX file.")
+    return extension
+
+
+def read_rows(file, format):
+    """
+    Returns an iterator over the row number and a dict of column name to cell
+    value of every non-blank row of a CSV or XLSX file opened in binary mode.
+    The first row names the columns. The file is read as it's iterated.
+    """
+    if format == "csv":
+        return csv_rows(file)
+    if format != "xlsx":
+        raise StudentImportError(f"Unsupported import format {format}.")
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, OSError):
+        raise StudentImportError("The file is not a valid XLSX workbook.")
+    return xlsx_rows(workbook)
+
+
+def csv_rows(file):
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield from named_rows(csv.reader(text))
+    except UnicodeDecodeError:
+        raise StudentImportError("The file is not UTF-8 encoded.")
+    except csv.Error as e:
+        raise StudentImportError(f"The file is not valid CSV: {e}")
+    finally:
+        # The caller owns file, don't let the wrapper close it
+        text.detach()
+
+
+def xlsx_rows(workbook):
+    try:
+        yield from named_rows(workbook.active.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def named_rows(rows):
+    header = next(rows, None) or ()
+    columns = [str(column or "").strip().lower() for column in header]
+    for number, row in enumerate(rows, start=2):
+        values = {column: value for column, value in zip(columns, row) if column}
+        if any(value not in (None, "") for value in values.values()):
+            yield number, values
+
+
+def cell_text(value):
+    """
+    A cell value as text. Spreadsheets store numbers such as enrolment and
+    mobile numbers as floats, and dates as datetimes.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def parse_date(value):
+    for format in (*settings.DATE_INPUT_FORMATS, "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, format).date()
+        except ValueError:
+            pass
+    return None
+
+
+class StudentImport:
+    """
+    Validates the rows of an import file and creates the valid ones in chunks
+    of batch_size with bulk_create(). The branches and the keys of existing
+    students are loaded once up front, so validating a row costs no queries.
+    Invalid rows are skipped and reported in errors.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or getattr(
+            settings, "STUDENT_IMPORT_BATCH_SIZE", 1000
+        )
+        self.created = 0
+        self.errors = []
+
+    def run(self, rows):
+        """
+        Imports rows from read_rows() in one transaction and returns the
+        number of students created and the errors of each rejected row.
+        """
+        created = []
+        with transaction.atomic():
+            self.branches = {
+                code.upper(): code
+                for code in Branch.objects.values_list("pk", flat=True)
+            }
+            self.enrolment_nos = set(StudentDetail.objects.values_list("pk", flat=True))
+            self.emails = set(StudentDetail.objects.values_list("email", flat=True))
+
+            rows = iter(rows)
+            while chunk := list(itertools.islice(rows, self.batch_size)):
+                students = []
+                for number, values in chunk:
+                    student, errors = self.validate(values)
+                    if errors:
+                        self.errors.append({"row": number, "errors": errors})
+                    else:
+                        students.append(student)
+                StudentDetail.objects.bulk_create(students)
+                created.extend(student.email for student in students)
+
+            # bulk_create() sends no post_save
+            if created:
+                bump_model_versions(StudentDetail)
+                bump_authorization_version(created)
+                invalidate_profiles(created)
+
+        self.created = len(created)
+        return {"created": self.created, "errors": self.errors}
+
+    def validate(self, values):
+        """
+        Returns an unsaved StudentDetail for the cell values of a row, or the
+        errors of each invalid field.
+        """
+        data = {name: cell_text(value) for name, value in values.items()}
+        errors = {}
+
+        for name in REQUIRED_COLUMNS:
+            if not data.get(name):
+                errors[name] = ["This field is required."]
+
+        for name, max_length in MAX_LENGTHS.items():
+            if len(data.get(name, "")) > max_length:
+                errors.setdefault(name, []).append(
+                    f"Ensure this field has no more than {max_length} characters."
+                )
+
+        student = StudentDetail(
+            **{name: data.get(name) or None for name in TEXT_COLUMNS}
+        )
+
+        if "email" not in errors:
+            try:
+                validate_email(student.email)
+            except ValidationError as e:
+                errors["email"] = list(e.messages)
+        if "email" not in errors and student.email in self.emails:
+            errors["email"] = [UNIQUE_MESSAGES["email"]]
+        if "enrolment_no" not in errors and student.enrolment_no in self.enrolment_nos:
+            errors["enrolment_no"] = [UNIQUE_MESSAGES["enrolment_no"]]
+        if "mobile_number" not in errors and not MOBILE_NUMBER_VALIDATOR.regex.search(
+            student.mobile_number
+        ):
+            errors["mobile_number"] = [MOBILE_NUMBER_VALIDATOR.message]
+
+        if "gender" not in errors:
+            student.gender = GENDERS.get(data["gender"].upper())
+            if student.gender is None:
+                errors["gender"] = [f'"{data["gender"]}" is not a valid choice.']
+
+        if "birth_date" not in errors:
+            student.birth_date = parse_date(data["birth_date"])
+            if student.birth_date is None:
+                errors["birth_date"] = ["Date has wrong format. Use dd/mm/yyyy."]
+
+        if "branch" not in errors:
+            student.branch_id = self.branches.get(data["branch"].upper())
+            if student.branch_id is None:
+                errors["branch"] = [f'Branch "{data["branch"]}" does not exist.']
+
+        if data.get("year_joined"):
+            if data["year_joined"].isdigit():
+                student.year_joined = int(data["year_joined"])
+            else:
+                errors["year_joined"] = ["A valid integer is required."]
+
+        if data.get("graduated"):
+            student.graduated = BOOLEAN_VALUES.get(data["graduated"].lower())
+            if student.graduated is None:
+                errors["graduated"] = ["Must be a valid boolean."]
+
+        if errors:
+            return None, errors
+
+        # Later rows may not reuse the keys
+        self.enrolment_nos.add(student.enrolment_no)
+        self.emails.add(student.email)
+        return student, {}
+
+
+def import_students(file, format, batch_size=None):
+    """
+    Imports the students in a CSV or XLSX file, see StudentImport. Raises
+    StudentImportError when the file can't be read.
+    """
+    return StudentImport(batch_size).run(read_rows(file, format))
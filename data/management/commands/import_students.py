@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data.imports import (
+    IMPORT_FORMATS,
+    StudentImportError,
+    import_format,
+    import_students,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports students from a CSV or XLSX file whose first row names the "
+        "columns after the student fields, branch being the branch code. "
+        "Invalid rows are skipped and reported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file to import.")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="File format, by default taken from the file extension.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Rows validated and created at a time, STUDENT_IMPORT_BATCH_SIZE "
+            "by default.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            format = options["format"] or import_format(options["path"])
+            with open(options["path"], "rb") as file:
+                report = import_students(file, format, options["batch_size"])
+        except (StudentImportError, OSError) as e:
+            raise CommandError(e)
+        elapsed = time.perf_counter() - started
+
+        for error in report["errors"]:
+            fields = "; ".join(
+                f"{field}: {' '.join(messages)}"
+                for field, messages in error["errors"].items()
+            )
+            self.stdout.write(f"Row {error['row']}: {fields}")
+
+        summary = (
+            f"Imported {report['created']} student(s), rejected "
+            f"{len(report['errors'])} row(s) ({elapsed:.2f}s)"
+        )
+        if report["errors"]:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from data.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the tombstones older than SYNC_TOMBSTONE_RETENTION. Sync "
+        "clients with older tokens get a full resync anyway."
+    )
+
+    def handle(self, *args, **options):
+        horizon = timezone.now() - timedelta(
+            seconds=getattr(settings, "SYNC_TOMBSTONE_RETENTION", 60 * 60 * 24 * 90)
+        )
+        count, _ = Tombstone.objects.filter(deleted_at__lt=horizon).delete()
+        if options["verbosity"] > 0:
+            self.stdout.write(f"Deleted {count} tombstone(s)")
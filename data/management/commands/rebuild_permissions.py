@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.authorization import compile_permission_index
+from data.permissions import rebuild_all_permissions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every staff member's permissions from the departments, "
+        "batches and faculty allocations and reports any drift from the stored "
+        "values. Pass --apply to fix it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Write the recomputed grants and permissions.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stale, missing, drifted = rebuild_all_permissions(apply=options["apply"])
+        elapsed = time.perf_counter() - started
+
+        for email, (stored, expected) in sorted(drifted.items()):
+            stored = compile_permission_index(stored)
+            expected = compile_permission_index(expected)
+            self.stdout.write(
+                f"{email}: {len(expected - stored)} missing, "
+                f"{len(stored - expected)} unexpected"
+            )
+            if options["verbosity"] > 1:
+                for entry in sorted(expected - stored):
+                    self.stdout.write(f"  + {'/'.join(entry)}")
+                for entry in sorted(stored - expected):
+                    self.stdout.write(f"  - {'/'.join(entry)}")
+
+        summary = (
+            f"{len(drifted)} staff drifted, {len(stale)} stale and "
+            f"{len(missing)} missing grants ({elapsed:.2f}s)"
+        )
+        if not (drifted or stale or missing):
+            self.stdout.write(self.style.SUCCESS(f"No drift ({elapsed:.2f}s)"))
+        elif options["apply"]:
+            self.stdout.write(self.style.SUCCESS(f"Fixed: {summary}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Drift: {summary}"))
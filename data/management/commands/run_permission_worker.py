@@ -0,0 +1,58 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from data.permissions import run_permission_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the queued department permission recompute jobs. Keeps polling "
+        "the queue unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue and exit.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls of an empty queue.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = self.drain(options["once"])
+            if count and options["verbosity"] > 0:
+                self.stdout.write(f"Ran {count} permission job(s)")
+            if options["once"]:
+                return
+            time.sleep(options["sleep"])
+
+    def drain(self, once):
+        """
+        Runs jobs until the queue is empty. An error outside the job itself,
+        such as a dropped connection, is logged and the queue polled again
+        later, unless once is set.
+        """
+        count = 0
+        while True:
+            # Long running, so connections aren't recycled per request
+            close_old_connections()
+            try:
+                if not run_permission_job():
+                    return count
+            except Exception:
+                if once:
+                    raise
+                logger.exception("Permission job failed, retrying later")
+                return count
+            count += 1
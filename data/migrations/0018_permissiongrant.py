@@ -0,0 +1,110 @@
+# Generated by Django 4.1.10 on 2026-10-18 20:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_permission_grants(apps, schema_editor):
+    Department = apps.get_model("data", "Department")
+    PermissionGrant = apps.get_model("data", "PermissionGrant")
+
+    grants = []
+    for department in Department.objects.filter(locked=False).prefetch_related(
+        "batch__faculty"
+    ):
+        for batch in department.batch.all():
+            grants.append(
+                PermissionGrant(
+                    staff_id=department.hod_id,
+                    department=department,
+                    batch=batch,
+                    role="HOD",
+                )
+            )
+            for faculty_id in {
+                allocation.faculty_id for allocation in batch.faculty.all()
+            }:
+                if faculty_id != department.hod_id:
+                    grants.append(
+                        PermissionGrant(
+                            staff_id=faculty_id,
+                            department=department,
+                            batch=batch,
+                            role="FACULTY",
+                        )
+                    )
+
+    PermissionGrant.objects.bulk_create(grants, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("data", "0017_staffdetail_admin"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PermissionGrant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[("HOD", "Head of Department"), ("FACULTY", "Faculty")],
+                        max_length=7,
+                        verbose_name="Role",
+                    ),
+                ),
+                (
+                    "batch",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="data.batch",
+                        verbose_name="Batch",
+                    ),
+                ),
+                (
+                    "department",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="data.department",
+                        verbose_name="Department",
+                    ),
+                ),
+                (
+                    "staff",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="data.staffdetail",
+                        verbose_name="Staff",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Permission Grant",
+                "verbose_name_plural": "Permission Grants",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="permissiongrant",
+            index=models.Index(
+                fields=["batch", "role"], name="data_permis_batch_i_7509d3_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="permissiongrant",
+            constraint=models.UniqueConstraint(
+                fields=("staff", "department", "batch", "role"),
+                name="unique_permission_grant",
+            ),
+        ),
+        migrations.RunPython(create_permission_grants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.10 on 2026-10-18 20:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("data", "0018_permissiongrant"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PermissionJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Queued At"),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Attempts"),
+                ),
+                ("last_error", models.TextField(blank=True, verbose_name="Last Error")),
+                (
+                    "department",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="data.department",
+                        verbose_name="Department",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Permission Job",
+                "verbose_name_plural": "Permission Jobs",
+            },
+        ),
+    ]
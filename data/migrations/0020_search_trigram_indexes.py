@@ -0,0 +1,47 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Columns searched by /api/v1/search/, see api_gateway/search.py. The indexes
+# are on UPPER(column), the expression Django's icontains compares, so both
+# the LIKE and the % (trigram similarity) filters can use them.
+SEARCH_FIELDS = {
+    "StudentDetail": ("enrolment_no", "first_name", "middle_name", "last_name", "email"),
+    "StaffDetail": ("email", "short_name", "first_name", "middle_name", "last_name"),
+}
+
+
+def search_indexes(apps):
+    for model_name, fields in SEARCH_FIELDS.items():
+        model = apps.get_model("data", model_name)
+        for field in fields:
+            column = model._meta.get_field(field).column
+            yield model._meta.db_table, column, f"{model._meta.db_table}_{column}_trgm"
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, column, name in search_indexes(apps):
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+            f'USING gin ((UPPER("{column}")) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, column, name in search_indexes(apps):
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data", "0019_permissionjob"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
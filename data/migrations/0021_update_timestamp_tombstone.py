@@ -0,0 +1,115 @@
+# Generated by Django 4.1.10 on 2026-10-18 21:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("data", "0020_search_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model",
+                    models.CharField(
+                        help_text="e.g. data.studentdetail",
+                        max_length=50,
+                        verbose_name="Model",
+                    ),
+                ),
+                (
+                    "object_pk",
+                    models.CharField(max_length=100, verbose_name="Object Primary Key"),
+                ),
+                (
+                    "deleted_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Deleted At"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tombstone",
+                "verbose_name_plural": "Tombstones",
+            },
+        ),
+        migrations.AddField(
+            model_name="batch",
+            name="update_timestamp",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="Update Timestamp",
+            ),
+        ),
+        migrations.AddField(
+            model_name="branch",
+            name="update_timestamp",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="Update Timestamp",
+            ),
+        ),
+        migrations.AddField(
+            model_name="department",
+            name="update_timestamp",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="Update Timestamp",
+            ),
+        ),
+        migrations.AddField(
+            model_name="staffdetail",
+            name="update_timestamp",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="Update Timestamp",
+            ),
+        ),
+        migrations.AddField(
+            model_name="studentdetail",
+            name="update_timestamp",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="Update Timestamp",
+            ),
+        ),
+        migrations.AddField(
+            model_name="subject",
+            name="update_timestamp",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="Update Timestamp",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(
+                fields=["model", "deleted_at"], name="data_tombst_model_47b2bd_idx"
+            ),
+        ),
+    ]
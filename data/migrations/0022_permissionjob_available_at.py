@@ -0,0 +1,22 @@
+# Generated by Django 4.1.10 on 2026-10-18 21:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("data", "0021_update_timestamp_tombstone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="permissionjob",
+            name="available_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                help_text="The job isn't run before then, failed jobs are retried later.",
+                verbose_name="Available At",
+            ),
+        ),
+    ]
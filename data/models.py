@@ -3,7 +3,54 @@ from django.db import models
 from django.utils import timezone
 
 
-class StaffDetail(models.Model):
+class LoadedValuesMixin:
+    """
+    Remembers the values of `tracked_fields` as they were loaded from (or last
+    saved to) the database, so signal handlers can tell what changed without
+    re-fetching the row.
+    """
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def _snapshot_loaded_values(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field: getattr(self, field)
+            for field in self.tracked_fields
+            if field not in deferred
+        }
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_loaded_values()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_loaded_values()
+
+    def get_loaded_values(self, fields):
+        """
+        Returns the stored values of fields, or None for a row that does not
+        exist yet. Instances that were not loaded from the database fall back
+        to a single query.
+        """
+        loaded_values = getattr(self, "_loaded_values", None)
+        if loaded_values is not None and all(
+            field in loaded_values for field in fields
+        ):
+            return loaded_values
+        if self.pk is None:
+            return None
+        return type(self).objects.filter(pk=self.pk).values(*fields).first()
+
+
+class StaffDetail(LoadedValuesMixin, models.Model):
     GENDER_CHOICES = [
         ("M", "Male"),
         ("F", "Female"),
@@ -66,6 +113,15 @@ class StaffDetail(models.Model):
         blank=True,
     )
 
+    update_timestamp = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name="Update Timestamp",
+    )
+
+    tracked_fields = ("admin", "active", "permissions")
+
     class Meta:
         verbose_name_plural = "Staff Details"
         verbose_name = "Staff Detail"
@@ -167,6 +223,13 @@ class Subject(models.Model):
         help_text="Weightage distribution of the subject",
     )
 
+    update_timestamp = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name="Update Timestamp",
+    )
+
     def delete(self, *args, **kwargs):
         for w in self.weightage.all():
             w.delete()
@@ -198,6 +261,13 @@ class Branch(models.Model):
         help_text="If branch is currently available to enrollment.",
     )
 
+    update_timestamp = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name="Update Timestamp",
+    )
+
     class Meta:
         verbose_name_plural = "Branches"
         verbose_name = "Branch"
@@ -206,7 +276,7 @@ class Branch(models.Model):
         return f"{self.branch_code} {self.branch_short_name}"
 
 
-class StudentDetail(models.Model):
+class StudentDetail(LoadedValuesMixin, models.Model):
     GENDER_CHOICES = [
         ("M", "Male"),
         ("F", "Female"),
@@ -256,6 +326,15 @@ class StudentDetail(models.Model):
         help_text="Is student already graduated?",
     )
 
+    update_timestamp = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name="Update Timestamp",
+    )
+
+    tracked_fields = ("graduated",)
+
     class Meta:
         verbose_name_plural = "Student Details"
         verbose_name = "Student Detail"
@@ -286,7 +365,7 @@ class FacultyAllocation(models.Model):
         return f"{self.faculty.email} {self.subject.subject_short_name}"
 
 
-class Batch(models.Model):
+class Batch(LoadedValuesMixin, models.Model):
     name = models.CharField(max_length=10, verbose_name="Batch Name")
     faculty = models.ManyToManyField(
         "FacultyAllocation",
@@ -301,6 +380,15 @@ class Batch(models.Model):
         help_text="Student allocated to batch",
     )
 
+    update_timestamp = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name="Update Timestamp",
+    )
+
+    tracked_fields = ("name",)
+
     class Meta:
         verbose_name_plural = "Batches"
         verbose_name = "Batch"
@@ -334,7 +422,7 @@ class StudyResource(models.Model):
         return f"{self.subject.subject_short_name} {self.resource_type}"
 
 
-class Department(models.Model):
+class Department(LoadedValuesMixin, models.Model):
     year = models.CharField(max_length=7, verbose_name="Year", help_text="e.g. 2022-23")
     semester = models.CharField(
         max_length=1, verbose_name="Semester", help_text="e.g. 1"
@@ -356,6 +444,15 @@ class Department(models.Model):
         help_text="Is the department locked?",
     )
 
+    update_timestamp = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name="Update Timestamp",
+    )
+
+    tracked_fields = ("year", "semester", "name", "hod_id", "locked")
+
     class Meta:
         verbose_name_plural = "Departments"
         verbose_name = "Department"
@@ -364,6 +461,77 @@ class Department(models.Model):
         return f"{self.year} SEM-{self.semester} {self.name}"
 
 
+class PermissionGrant(models.Model):
+    ROLE_CHOICES = [
+        ("HOD", "Head of Department"),
+        ("FACULTY", "Faculty"),
+    ]
+
+    staff = models.ForeignKey(
+        "StaffDetail", verbose_name="Staff", on_delete=models.CASCADE
+    )
+    department = models.ForeignKey(
+        "Department", verbose_name="Department", on_delete=models.CASCADE
+    )
+    batch = models.ForeignKey("Batch", verbose_name="Batch", on_delete=models.CASCADE)
+    role = models.CharField(max_length=7, choices=ROLE_CHOICES, verbose_name="Role")
+
+    class Meta:
+        verbose_name_plural = "Permission Grants"
+        verbose_name = "Permission Grant"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["staff", "department", "batch", "role"],
+                name="unique_permission_grant",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["batch", "role"]),
+        ]
+
+    def __str__(self):
+        return f"{self.staff_id} {self.role} {self.batch_id}"
+
+
+class PermissionJob(models.Model):
+    department = models.OneToOneField(
+        "Department", verbose_name="Department", on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Queued At")
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Available At",
+        help_text="The job isn't run before then, failed jobs are retried later.",
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Attempts")
+    last_error = models.TextField(blank=True, verbose_name="Last Error")
+
+    class Meta:
+        verbose_name_plural = "Permission Jobs"
+        verbose_name = "Permission Job"
+
+    def __str__(self):
+        return f"Recompute permissions of department {self.department_id}"
+
+
+class Tombstone(models.Model):
+    model = models.CharField(
+        max_length=50, verbose_name="Model", help_text="e.g. data.studentdetail"
+    )
+    object_pk = models.CharField(max_length=100, verbose_name="Object Primary Key")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Deleted At")
+
+    class Meta:
+        verbose_name_plural = "Tombstones"
+        verbose_name = "Tombstone"
+        indexes = [
+            models.Index(fields=["model", "deleted_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_pk} deleted at {self.deleted_at}"
+
+
 class Attendance(models.Model):
     RESOURCE_TYPE_CHOICES = (("R", "Regular"), ("PRX", "proxy"))
     date = models.DateField(verbose_name="Date", help_text="dd/mm/yyyy")
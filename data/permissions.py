@@ -0,0 +1,426 @@
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+from threading import local
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.utils import timezone
+
+from authentication.claims import bump_permissions_version
+
+from .models import (
+    Batch,
+    Department,
+    FacultyAllocation,
+    PermissionGrant,
+    PermissionJob,
+    StaffDetail,
+)
+from .utils import permissions_assign
+from .versions import bump_model_versions
+
+logger = logging.getLogger(__name__)
+
+HOD_PERMISSIONS = {
+    "attendance": {"create": True, "read": True, "update": True, "delete": True},
+    "test_result": {"create": True, "read": True, "update": True, "delete": True},
+    "project": {"create": True, "read": True, "update": True, "delete": True},
+    "mooc": {"create": True, "read": True, "update": True, "delete": True},
+}
+
+FACULTY_PERMISSIONS = {
+    "attendance": {"create": True, "read": True, "update": False, "delete": False},
+    "test_result": {"create": True, "read": True, "update": False, "delete": False},
+    "project": {"create": True, "read": True, "update": True, "delete": False},
+    "mooc": {"create": True, "read": True, "update": False, "delete": False},
+}
+
+ROLE_PERMISSIONS = {
+    "HOD": HOD_PERMISSIONS,
+    "FACULTY": FACULTY_PERMISSIONS,
+}
+
+
+def department_grants(department):
+    """
+    Returns the (staff, batch, role) grants implied by a department: the HOD
+    on every batch and each allocated faculty on their batches. Locked
+    departments grant nothing.
+    """
+    if department.locked:
+        return set()
+
+    # One query over the department batches left-joined to their allocations
+    rows = Department.batch.through.objects.filter(department=department).values_list(
+        "batch_id", "batch__faculty__faculty_id"
+    )
+
+    grants = set()
+    for batch_id, faculty_id in rows:
+        grants.add((department.hod_id, batch_id, "HOD"))
+        if faculty_id is not None and faculty_id != department.hod_id:
+            grants.add((faculty_id, batch_id, "FACULTY"))
+    return grants
+
+
+def sync_department_grants(department):
+    """
+    Brings the PermissionGrant rows of a department in line with its HOD,
+    batches and faculty allocations using one set-based delete and one
+    bulk_create. Returns the emails of every staff member holding a grant in
+    the department before or after the sync.
+    """
+    existing = {
+        (staff_id, batch_id, role): grant_id
+        for grant_id, staff_id, batch_id, role in PermissionGrant.objects.filter(
+            department=department
+        ).values_list("id", "staff_id", "batch_id", "role")
+    }
+    desired = department_grants(department)
+
+    stale = [grant_id for key, grant_id in existing.items() if key not in desired]
+    if stale:
+        PermissionGrant.objects.filter(id__in=stale).delete()
+
+    PermissionGrant.objects.bulk_create(
+        [
+            PermissionGrant(
+                staff_id=staff_id, department=department, batch_id=batch_id, role=role
+            )
+            for staff_id, batch_id, role in desired
+            if (staff_id, batch_id, role) not in existing
+        ],
+        ignore_conflicts=True,
+    )
+
+    return {staff_id for staff_id, _, _ in existing} | {
+        staff_id for staff_id, _, _ in desired
+    }
+
+
+def build_permissions(grants):
+    """
+    Builds the StaffDetail.permissions trees from
+    (email, year, semester, department name, batch name, role) rows.
+    """
+    trees = {}
+    for email, year, semester, name, batch, role in grants:
+        permissions_assign(
+            trees.setdefault(email, {}),
+            [year, semester, name, batch],
+            ROLE_PERMISSIONS[role],
+        )
+    return trees
+
+
+def rebuild_permissions(emails):
+    """
+    Re-derives the StaffDetail.permissions JSON of the given staff from their
+    grants. The JSON is kept as a materialized view of PermissionGrant for
+    existing readers; only rows whose tree actually changed are written, in a
+    single bulk_update.
+    """
+    emails = set(email for email in emails if email)
+    if not emails:
+        return
+
+    trees = build_permissions(
+        PermissionGrant.objects.filter(staff_id__in=emails).values_list(
+            "staff_id",
+            "department__year",
+            "department__semester",
+            "department__name",
+            "batch__name",
+            "role",
+        )
+    )
+
+    changed = []
+    for staff in StaffDetail.objects.filter(email__in=emails).only(
+        "email", "permissions"
+    ):
+        permissions = trees.get(staff.email, {})
+        if staff.permissions != permissions:
+            staff.permissions = permissions
+            staff.update_timestamp = timezone.now()
+            changed.append(staff)
+
+    StaffDetail.objects.bulk_update(changed, ["permissions", "update_timestamp"])
+    bump_permissions_version(staff.email for staff in changed)
+    if changed:
+        bump_model_versions(StaffDetail)
+
+
+def refresh_department_permissions(departments):
+    emails = set()
+    for department in departments:
+        emails |= sync_department_grants(department)
+    rebuild_permissions(emails)
+
+
+def expected_permissions():
+    """
+    Recomputes every permission grant from scratch in one pass over the
+    unlocked departments, their batches and the batches' faculty allocations
+    (three queries). Returns the (staff, department, batch, role) grants and
+    the permission tree of every staff member holding one.
+    """
+    departments = (
+        Department.objects.filter(locked=False)
+        .only("id", "year", "semester", "name", "hod_id")
+        .prefetch_related(
+            Prefetch("batch", queryset=Batch.objects.only("id", "name")),
+            Prefetch(
+                "batch__faculty",
+                queryset=FacultyAllocation.objects.only("id", "faculty_id"),
+            ),
+        )
+    )
+
+    grants = set()
+    rows = []
+    for department in departments:
+        for batch in department.batch.all():
+            holders = {(department.hod_id, "HOD")}
+            holders.update(
+                (allocation.faculty_id, "FACULTY")
+                for allocation in batch.faculty.all()
+                if allocation.faculty_id != department.hod_id
+            )
+            for staff_id, role in holders:
+                grants.add((staff_id, department.id, batch.id, role))
+                rows.append(
+                    (
+                        staff_id,
+                        department.year,
+                        department.semester,
+                        department.name,
+                        batch.name,
+                        role,
+                    )
+                )
+
+    return grants, build_permissions(rows)
+
+
+def rebuild_all_permissions(apply=False):
+    """
+    Diffs the stored grants and StaffDetail.permissions against
+    expected_permissions(). Returns the stale grant ids, the missing grants and
+    a {staff: (stored, expected)} map of drifted trees; with apply the drift
+    is fixed in one transaction with a single bulk_update.
+    """
+    grants, trees = expected_permissions()
+
+    existing = {
+        (staff_id, department_id, batch_id, role): grant_id
+        for grant_id, staff_id, department_id, batch_id, role in (
+            PermissionGrant.objects.values_list(
+                "id", "staff_id", "department_id", "batch_id", "role"
+            )
+        )
+    }
+    stale = [grant_id for key, grant_id in existing.items() if key not in grants]
+    missing = [key for key in grants if key not in existing]
+
+    drifted = {}
+    changed = []
+    for staff in StaffDetail.objects.only("email", "permissions"):
+        permissions = trees.get(staff.email, {})
+        if staff.permissions != permissions:
+            drifted[staff.email] = (staff.permissions, permissions)
+            staff.permissions = permissions
+            staff.update_timestamp = timezone.now()
+            changed.append(staff)
+
+    if apply:
+        with transaction.atomic():
+            PermissionGrant.objects.filter(id__in=stale).delete()
+            PermissionGrant.objects.bulk_create(
+                [
+                    PermissionGrant(
+                        staff_id=staff_id,
+                        department_id=department_id,
+                        batch_id=batch_id,
+                        role=role,
+                    )
+                    for staff_id, department_id, batch_id, role in missing
+                ],
+                ignore_conflicts=True,
+            )
+            StaffDetail.objects.bulk_update(
+                changed, ["permissions", "update_timestamp"], batch_size=500
+            )
+            bump_permissions_version(drifted)
+            bump_model_versions(StaffDetail)
+
+    return stale, missing, drifted
+
+
+# Background recomputation
+
+PERMISSION_JOB_MAX_ATTEMPTS = 5
+# Seconds before the first retry of a failed job, doubled for every later one
+PERMISSION_JOB_RETRY_DELAY = 30
+
+
+def permission_jobs_async():
+    return getattr(settings, "PERMISSION_JOBS_ASYNC", False)
+
+
+def enqueue_permission_jobs(department_ids):
+    """
+    Queues a recompute job per department. A department already in the queue
+    is not queued twice, its job is reset to run now with a fresh set of
+    attempts, even if the earlier ones were exhausted. Jobs re-derive
+    everything from the current rows, so running one late or twice is
+    harmless.
+    """
+    now = timezone.now()
+    PermissionJob.objects.bulk_create(
+        [
+            PermissionJob(department_id=department_id, created_at=now, available_at=now)
+            for department_id in set(department_ids)
+        ],
+        update_conflicts=True,
+        unique_fields=["department"],
+        update_fields=["created_at", "available_at", "attempts"],
+    )
+
+
+def run_permission_job():
+    """
+    Claims the oldest available job and recomputes its department. The job
+    row is removed in the same transaction, so a change committed while it
+    runs queues a fresh job. Failures are recorded on the job and retried with
+    exponential backoff, up to PERMISSION_JOB_MAX_ATTEMPTS times. Returns
+    False once no job is available.
+    """
+    with transaction.atomic():
+        job = (
+            PermissionJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                attempts__lt=PERMISSION_JOB_MAX_ATTEMPTS,
+                available_at__lte=timezone.now(),
+            )
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return False
+
+        job_id = job.pk
+        try:
+            with transaction.atomic():
+                job.delete()
+                refresh_department_permissions(
+                    Department.objects.filter(pk=job.department_id)
+                )
+        except Exception as e:
+            delay = timedelta(seconds=PERMISSION_JOB_RETRY_DELAY * 2**job.attempts)
+            PermissionJob.objects.filter(pk=job_id).update(
+                attempts=F("attempts") + 1,
+                available_at=timezone.now() + delay,
+                last_error=str(e),
+            )
+    return True
+
+
+class PermissionWriteCollector:
+    """
+    Unit of work for permission mutations. Departments to re-sync and staff
+    whose tree must be re-derived are deduplicated, then written once.
+    """
+
+    def __init__(self):
+        self.department_ids = set()
+        self.emails = set()
+
+    def flush(self):
+        """
+        Writes the collected changes. It runs once the business write has
+        committed, so a failure is logged and the affected departments are
+        queued for run_permission_worker instead of failing the request.
+        """
+        try:
+            self.write()
+        except Exception:
+            logger.exception("Permission write failed, queueing recompute jobs")
+            department_ids = self.department_ids | set(
+                PermissionGrant.objects.filter(staff_id__in=self.emails).values_list(
+                    "department_id", flat=True
+                )
+            )
+            enqueue_permission_jobs(department_ids)
+
+    def write(self):
+        with transaction.atomic():
+            if permission_jobs_async():
+                enqueue_permission_jobs(self.department_ids)
+                rebuild_permissions(self.emails)
+                return
+
+            emails = set(self.emails)
+            for department in Department.objects.filter(pk__in=self.department_ids):
+                emails |= sync_department_grants(department)
+            rebuild_permissions(emails)
+
+
+_collector = local()
+
+
+def current_collector():
+    return getattr(_collector, "value", None)
+
+
+@contextmanager
+def coalesce_permission_writes():
+    """
+    Runs the block in a transaction and defers every permission write the
+    signals request inside it to a single flush on commit, so bulk batch and
+    department edits touch each StaffDetail row at most once. Usable as a
+    decorator; nested blocks join the outermost one.
+    """
+    if current_collector() is not None:
+        yield
+        return
+
+    collector = PermissionWriteCollector()
+    with transaction.atomic():
+        _collector.value = collector
+        try:
+            yield
+        finally:
+            _collector.value = None
+        transaction.on_commit(collector.flush)
+
+
+def queue_department_refresh(departments):
+    collector = current_collector()
+    if collector is None and permission_jobs_async():
+        enqueue_permission_jobs(department.pk for department in departments)
+    elif collector is None:
+        refresh_department_permissions(departments)
+    else:
+        collector.department_ids.update(department.pk for department in departments)
+
+
+def queue_permissions_rebuild(emails):
+    collector = current_collector()
+    if collector is None:
+        rebuild_permissions(emails)
+    else:
+        collector.emails.update(emails)
+
+
+def grant_emails(**filters):
+    return set(
+        PermissionGrant.objects.filter(**filters).values_list("staff_id", flat=True)
+    )
+
+
+def staff_with_batch_access(batch):
+    """Returns the staff who hold any permission on batch."""
+    return StaffDetail.objects.filter(permissiongrant__batch=batch).distinct()
@@ -1,7 +1,3 @@
-import json
-from copy import deepcopy
-
-from django.core.serializers import serialize
 from django.db.models.signals import (
     m2m_changed,
     post_delete,
@@ -10,260 +6,350 @@ from django.db.models.signals import (
     pre_save,
 )
 from django.dispatch import receiver
+from django.utils import timezone
+
+from authentication.claims import bump_authorization_version
+
+from .models import (
+    Batch,
+    Branch,
+    Department,
+    FacultyAllocation,
+    StaffDetail,
+    StudentDetail,
+    StudyResource,
+    Subject,
+    Weightage,
+)
+from .permissions import (
+    FACULTY_PERMISSIONS,
+    HOD_PERMISSIONS,
+    grant_emails,
+    queue_department_refresh,
+    queue_permissions_rebuild,
+)
+from .sync import m2m_field, record_tombstone, touch, touch_m2m_owners
+from .versions import bump_model_versions
 
-from .models import Batch, Department, FacultyAllocation
-from .utils import delete_empty_keys, permissions_assign
+# Department fields that shape the permission grants or the permission tree
+DEPARTMENT_PERMISSION_FIELDS = ("year", "semester", "name", "hod_id", "locked")
 
-HOD_PERMISSIONS = {
-    "attendance": {"create": True, "read": True, "update": True, "delete": True},
-    "test_result": {"create": True, "read": True, "update": True, "delete": True},
-    "project": {"create": True, "read": True, "update": True, "delete": True},
-    "mooc": {"create": True, "read": True, "update": True, "delete": True},
-}
 
-FACULTY_PERMISSIONS = {
-    "attendance": {"create": True, "read": True, "update": False, "delete": False},
-    "test_result": {"create": True, "read": True, "update": False, "delete": False},
-    "project": {"create": True, "read": True, "update": True, "delete": False},
-    "mooc": {"create": True, "read": True, "update": False, "delete": False},
-}
+@receiver(m2m_changed, sender=Department.batch.through)
+def m2m_changed_handler(sender, instance, action, reverse, model, pk_set, **kwargs):
+    try:
+        if reverse:
+            if action == "pre_clear":
+                instance._cleared_departments = list(instance.department_set.all())
+            elif action in ("post_add", "post_remove"):
+                queue_department_refresh(Department.objects.filter(pk__in=pk_set))
+            elif action == "post_clear":
+                queue_department_refresh(instance._cleared_departments)
 
+        elif action == "post_add":
+            queue_department_refresh([instance])
 
-def permission_assignment_from_batches(instance, batches):
-    try:
-        hod = instance.hod
-        for batch in batches:
-            permissions_assign(
-                hod.permissions,
-                [instance.year, instance.semester, instance.name, batch.name],
-                HOD_PERMISSIONS,
-            )
-            for staff in batch.faculty.all():
-                if staff.faculty.email == hod.email:
-                    continue
-                permissions_assign(
-                    staff.faculty.permissions,
-                    [instance.year, instance.semester, instance.name, batch.name],
-                    FACULTY_PERMISSIONS,
-                )
-                staff.faculty.save()
-        hod.save()
+        elif action == "post_remove":
+            queue_department_refresh([instance])
+            for batch in Batch.objects.filter(pk__in=pk_set):
+                batch.delete()
+
+        elif action == "post_clear":
+            queue_department_refresh([instance])
     except Exception as e:
         pass
-        # print(f"permission assignment from batches {e}")
 
 
-def permission_assignment_from_department(instance):
+@receiver(pre_save, sender=Department)
+def handle_department_modifications(
+    sender, instance, raw=False, **kwargs
+):  # It'll also handle department creation
+    instance._permissions_changed = False
+    if raw or not instance.pk:
+        return
+
+    old_values = instance.get_loaded_values(DEPARTMENT_PERMISSION_FIELDS)
+    instance._permissions_changed = old_values is not None and any(
+        old_values[field] != getattr(instance, field)
+        for field in DEPARTMENT_PERMISSION_FIELDS
+    )
+
+
+@receiver(post_save, sender=Department)
+def handle_department_permissions(sender, instance, raw=False, **kwargs):
     try:
-        batches = instance.batch.all()
-        permission_assignment_from_batches(instance, batches)
+        if getattr(instance, "_permissions_changed", False):
+            queue_department_refresh([instance])
     except Exception as e:
         pass
-        # print(f"permission assignment from department {e}")
 
 
-def permission_revocation_from_batches(instance, batches):
+@receiver(pre_delete, sender=Department)
+def handle_hod_updation(sender, instance, **kwargs):  # handle deleting a department
     try:
-        hod = instance.hod
-
-        for batch in batches:
-            del hod.permissions[instance.year][instance.semester][instance.name][
-                batch.name
-            ]
-            delete_empty_keys(hod.permissions)
-        hod.save()
-
-        for batch in batches:
-            for staff in batch.faculty.all():
-                if staff.faculty.email == hod.email:
-                    continue
-                del staff.faculty.permissions[instance.year][instance.semester][
-                    instance.name
-                ][batch.name]
-                delete_empty_keys(staff.faculty.permissions)
-                staff.faculty.save()
+        if instance.pk:
+            instance._permission_emails = grant_emails(department=instance)
+            for batch in instance.batch.all():
+                batch.delete()
     except Exception as e:
         pass
-        # print(f"permission revocation from batches {e}")
 
 
-def permission_revocation_from_department(instance):
+@receiver(post_delete, sender=Department)
+def handle_department_delete(sender, instance, **kwargs):
     try:
-        hod = instance.hod
-        del hod.permissions[instance.year][instance.semester][instance.name]
-        delete_empty_keys(hod.permissions)
-        hod.save()
-
-        for batch in instance.batch.all():
-            for staff in batch.faculty.all():
-                try:
-                    del staff.faculty.permissions[instance.year][instance.semester][
-                        instance.name
-                    ]
-                except Exception as e:
-                    pass
-                delete_empty_keys(staff.faculty.permissions)
-                staff.faculty.save()
-
+        queue_permissions_rebuild(getattr(instance, "_permission_emails", ()))
     except Exception as e:
         pass
-        # print(f"permission revocation from department {e}")
 
 
-def hod_permission_transfer(instance):
+# Batch signals
+
+
+@receiver(m2m_changed, sender=Batch.faculty.through)
+def handle_batch_faculty_updation(
+    sender, instance, action=None, reverse=None, model=None, pk_set=None, **kwargs
+):
     try:
-        if instance.pk:
-            original_department = Department.objects.get(pk=instance.pk)
-            old_hod_permissions = original_department.hod.permissions
-
-            for batch in original_department.batch.all():
-                isHod = False
-                for staff in batch.faculty.all():
-                    if staff.faculty.email == original_department.hod.email:
-                        isHod = True
-                if isHod:
-                    old_hod_permissions[instance.year][instance.semester][
-                        instance.name
-                    ][batch.name] = FACULTY_PERMISSIONS
-                else:
-                    del old_hod_permissions[instance.year][instance.semester][
-                        instance.name
-                    ][batch.name]
-            delete_empty_keys(original_department.hod.permissions)
-            original_department.hod.save()
+        if action == "pre_clear":
+            instance._cleared_departments = list(
+                Department.objects.filter(batch__faculty=instance)
+                if reverse
+                else instance.department_set.all()
+            )
+        elif action == "post_clear":
+            queue_department_refresh(instance._cleared_departments)
+        elif action in ("post_add", "post_remove"):
+            if reverse:  # batches added to or removed from a faculty allocation
+                departments = Department.objects.filter(batch__in=pk_set).distinct()
+            else:
+                departments = instance.department_set.all()
+            queue_department_refresh(departments)
     except Exception as e:
         pass
-        # print(f"hod permission transfer {e}")
 
 
-@receiver(m2m_changed, sender=Department.batch.through)
-def m2m_changed_handler(sender, instance, action, reverse, model, pk_set, **kwargs):
-    try:
-        if action == "post_add":
-            batches = Batch.objects.filter(pk__in=pk_set)
-            permission_assignment_from_batches(instance, batches)
+@receiver(pre_save, sender=Batch)
+def track_batch_rename(sender, instance, raw=False, **kwargs):
+    instance._renamed = False
+    if raw or not instance.pk:
+        return
 
-        elif action == "post_remove":
-            batches = Batch.objects.filter(pk__in=pk_set)
-            permission_revocation_from_batches(instance, batches)
-            for batch in batches:
-                batch.delete()
+    old_values = instance.get_loaded_values(("name",))
+    instance._renamed = old_values is not None and old_values["name"] != instance.name
+
+
+@receiver(post_save, sender=Batch)
+def handle_batch_rename(sender, instance, created=False, raw=False, **kwargs):
+    try:
+        if getattr(instance, "_renamed", False):
+            queue_permissions_rebuild(grant_emails(batch=instance))
     except Exception as e:
         pass
-        # print(f"m2m change department batch {e}")
 
 
-@receiver(pre_save, sender=Department)
-def handle_department_modifications(
-    sender, instance, **kwargs
-):  # It'll also handle department creation
+@receiver(pre_delete, sender=Batch)
+def handle_batch_delete(sender, instance, **kwargs):
     try:
         if instance.pk:
-            old_instance = sender.objects.get(pk=instance.pk)
-            if old_instance.locked and not instance.locked:
-                permission_assignment_from_department(instance)
-            elif not old_instance.locked and instance.locked:
-                permission_revocation_from_department(instance)
-            elif not old_instance.locked and not instance.locked:
-                if old_instance.hod.email != instance.hod.email:
-                    hod_permission_transfer(instance)
-                    permission_assignment_from_department(instance)
-
+            instance._permission_emails = grant_emails(batch=instance)
     except Exception as e:
         pass
-        # print(f"department pre_save {e}")
 
 
-@receiver(pre_delete, sender=Department)
-def handle_hod_updation(sender, instance, **kwargs):  # handle deleting a department
+@receiver(post_delete, sender=Batch)
+def handle_batch_deleted(sender, instance, **kwargs):
     try:
-        if instance.pk:
-            permission_revocation_from_department(instance)
-            for batch in instance.batch.all():
-                batch.delete()
+        queue_permissions_rebuild(getattr(instance, "_permission_emails", ()))
     except Exception as e:
         pass
-        # print("WARNING", e)
 
 
-# Batch signals
+# Faculty allocation signals
 
 
-@receiver(m2m_changed, sender=Batch.faculty.through)
-def handle_batch_faculty_updation(
-    sender, instance, action=None, reverse=None, model=None, pk_set=None, **kwargs
+@receiver(post_save, sender=FacultyAllocation)
+def handle_faculty_allocation_updation(
+    sender, instance, created=False, raw=False, **kwargs
 ):
     try:
-        if action == "pre_add":  # handle adding new faculty to a batch
-            added_faculties = FacultyAllocation.objects.filter(pk__in=pk_set)
-
-            batch = instance
-
-            for department in instance.department_set.all():
-                hod = department.hod
-                permissions_assign(
-                    hod.permissions,
-                    [department.year, department.semester, department.name, batch.name],
-                    HOD_PERMISSIONS,
-                )
-                hod.save()
-
-                for staff in added_faculties:
-                    if staff.faculty.email == hod.email:
-                        continue
-                    permissions_assign(
-                        staff.faculty.permissions,
-                        [
-                            department.year,
-                            department.semester,
-                            department.name,
-                            batch.name,
-                        ],
-                        FACULTY_PERMISSIONS,
-                    )
-                    staff.faculty.save()
-
-        elif action == "pre_remove":  # handle removing faculties from a batch
-            removed_faculties = FacultyAllocation.objects.filter(pk__in=pk_set)
-
-            for department in instance.department_set.all():
-                hod = department.hod
-                batch = instance
-
-                for staff in removed_faculties:
-                    if hod.email == staff.faculty.email:
-                        continue
-                    staff.faculty.permissions[department.year][department.semester][
-                        department.name
-                    ][batch.name] = {}
-                    delete_empty_keys(staff.faculty.permissions)
-                    staff.faculty.save()
-
+        if not created and not raw:
+            queue_department_refresh(
+                Department.objects.filter(batch__faculty=instance).distinct()
+            )
     except Exception as e:
         pass
-        # print(action, "WARNING", e)
 
 
-@receiver(pre_delete, sender=Batch)
-def handle_batch_delete(sender, instance, **kwargs):
+@receiver(pre_delete, sender=FacultyAllocation)
+def handle_faculty_allocation_delete(sender, instance, **kwargs):
     try:
-        if instance.pk:
-            batch = Batch.objects.get(pk=instance.pk)
-            departments = batch.department_set.all()
-
-            for department in departments:
-                del department.hod.permissions[department.year][department.semester][
-                    department.name
-                ][batch.name]
-                delete_empty_keys(department.hod.permissions)
-                department.hod.save()
-                for staff in batch.faculty.all():
-                    del staff.faculty.permissions[department.year][department.semester][
-                        department.name
-                    ][batch.name]
-                    delete_empty_keys(staff.faculty.permissions)
-                    staff.faculty.save()
+        instance._permission_departments = list(
+            Department.objects.filter(batch__faculty=instance).distinct()
+        )
+    except Exception as e:
+        pass
 
+
+@receiver(post_delete, sender=FacultyAllocation)
+def handle_faculty_allocation_deleted(sender, instance, **kwargs):
+    try:
+        queue_department_refresh(getattr(instance, "_permission_departments", ()))
     except Exception as e:
         pass
-        # print("WARNING", e)
+
+
+# Staff detail signals
+
+
+@receiver(pre_save, sender=StaffDetail)
+def track_permissions_write(sender, instance, raw=False, **kwargs):
+    instance._permissions_written = False
+    if raw:
+        return
+
+    old_values = instance.get_loaded_values(("permissions",))
+    if old_values is None:
+        instance._permissions_written = bool(instance.permissions)
+    else:
+        instance._permissions_written = (
+            old_values["permissions"] != instance.permissions
+        )
+
+
+@receiver(post_save, sender=StaffDetail)
+def restore_derived_permissions(sender, instance, raw=False, **kwargs):
+    # The tree is derived from PermissionGrant, re-deriving it undoes a direct
+    # write and retires the cached permission indexes
+    if getattr(instance, "_permissions_written", False):
+        queue_permissions_rebuild([instance.email])
+
+
+# Authorization version signals
+
+AUTHORIZATION_FIELDS = {
+    StaffDetail: ("admin", "active"),
+    StudentDetail: ("graduated",),
+    Department: ("hod_id", "locked"),
+}
+
+
+def authorization_emails(instance, old_values=None):
+    if isinstance(instance, Department):
+        emails = {instance.hod_id}
+        if old_values:
+            emails.add(old_values["hod_id"])
+        return emails
+    return {instance.email}
+
+
+@receiver(pre_save, sender=StaffDetail)
+@receiver(pre_save, sender=StudentDetail)
+@receiver(pre_save, sender=Department)
+def track_authorization_changes(sender, instance, raw=False, **kwargs):
+    instance._authorization_emails = set()
+    if raw:
+        return
+
+    fields = AUTHORIZATION_FIELDS[sender]
+    old_values = instance.get_loaded_values(fields)
+
+    if old_values is None or any(
+        old_values[field] != getattr(instance, field) for field in fields
+    ):
+        instance._authorization_emails = authorization_emails(instance, old_values)
+
+
+@receiver(post_save, sender=StaffDetail)
+@receiver(post_save, sender=StudentDetail)
+@receiver(post_save, sender=Department)
+def bump_changed_authorization(sender, instance, raw=False, **kwargs):
+    bump_authorization_version(getattr(instance, "_authorization_emails", ()))
+
+
+@receiver(post_delete, sender=StaffDetail)
+@receiver(post_delete, sender=StudentDetail)
+@receiver(post_delete, sender=Department)
+def bump_deleted_authorization(sender, instance, **kwargs):
+    bump_authorization_version(authorization_emails(instance))
+
+
+# Table version signals
+
+
+@receiver([post_save, post_delete], sender=StaffDetail)
+@receiver([post_save, post_delete], sender=StudentDetail)
+@receiver([post_save, post_delete], sender=Branch)
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Weightage)
+@receiver([post_save, post_delete], sender=FacultyAllocation)
+@receiver([post_save, post_delete], sender=Batch)
+@receiver([post_save, post_delete], sender=Department)
+def bump_model_version(sender, **kwargs):
+    bump_model_versions(sender)
+
+
+@receiver(m2m_changed, sender=Subject.weightage.through)
+@receiver(m2m_changed, sender=Batch.faculty.through)
+@receiver(m2m_changed, sender=Batch.student.through)
+@receiver(m2m_changed, sender=Department.branch.through)
+@receiver(m2m_changed, sender=Department.batch.through)
+def bump_m2m_model_versions(sender, instance, action, model, **kwargs):
+    if action.startswith("post_"):
+        bump_model_versions(type(instance), model)
+
+
+# Delta sync signals
+
+
+@receiver(pre_save, sender=StaffDetail)
+@receiver(pre_save, sender=StudentDetail)
+@receiver(pre_save, sender=Branch)
+@receiver(pre_save, sender=Subject)
+@receiver(pre_save, sender=Batch)
+@receiver(pre_save, sender=Department)
+def bump_update_timestamp(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.update_timestamp = timezone.now()
+
+
+@receiver(post_delete, sender=StaffDetail)
+@receiver(post_delete, sender=StudentDetail)
+@receiver(post_delete, sender=Branch)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Batch)
+@receiver(post_delete, sender=Department)
+def write_tombstone(sender, instance, **kwargs):
+    record_tombstone(instance)
+
+
+@receiver(m2m_changed, sender=Subject.weightage.through)
+@receiver(m2m_changed, sender=Batch.faculty.through)
+@receiver(m2m_changed, sender=Batch.student.through)
+@receiver(m2m_changed, sender=Department.branch.through)
+@receiver(m2m_changed, sender=Department.batch.through)
+@receiver(m2m_changed, sender=Department.study_resource.through)
+def touch_m2m_changes(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            touch(type(instance).objects.filter(pk=instance.pk))
+    elif action == "pre_clear":
+        touch_m2m_owners(instance, [m2m_field(sender)])
+    elif action in ("post_add", "post_remove"):
+        touch(model.objects.filter(pk__in=pk_set))
+
+
+@receiver(pre_delete, sender=Weightage)
+@receiver(pre_delete, sender=FacultyAllocation)
+@receiver(pre_delete, sender=StudentDetail)
+@receiver(pre_delete, sender=Branch)
+@receiver(pre_delete, sender=Batch)
+@receiver(pre_delete, sender=StudyResource)
+def touch_deleted_m2m_members(sender, instance, **kwargs):
+    touch_m2m_owners(instance)
+
+
+@receiver(post_save, sender=Weightage)
+def touch_weightage_subjects(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch(Subject.objects.filter(weightage=instance))
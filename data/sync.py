@@ -0,0 +1,58 @@
+from django.utils import timezone
+
+from .models import (
+    Batch,
+    Branch,
+    Department,
+    StaffDetail,
+    StudentDetail,
+    Subject,
+    Tombstone,
+)
+from .versions import bump_model_versions, model_label
+
+# Models mirrored by /api/v1/sync/, each with an indexed update_timestamp
+SYNCED_MODELS = (StudentDetail, StaffDetail, Branch, Subject, Batch, Department)
+
+# Many-to-many fields rendered as part of their owner's synced record, a
+# change to their members is a change to the owner
+SYNCED_M2M_FIELDS = (
+    Subject.weightage.field,
+    Batch.faculty.field,
+    Batch.student.field,
+    Department.branch.field,
+    Department.batch.field,
+    Department.study_resource.field,
+)
+
+
+def touch(queryset):
+    """
+    Moves the update_timestamp of the rows in queryset to now, for changes
+    that don't go through their save().
+    """
+    if queryset.update(update_timestamp=timezone.now()):
+        bump_model_versions(queryset.model)
+
+
+def touch_m2m_owners(instance, fields=SYNCED_M2M_FIELDS):
+    """
+    Touches the records that hold instance in one of fields. Deleting
+    instance removes it from them without any m2m_changed signal, so this
+    runs from pre_delete, while the relations are still there.
+    """
+    for field in fields:
+        if isinstance(instance, field.related_model):
+            touch(field.model.objects.filter(**{field.name: instance}))
+
+
+def m2m_field(through):
+    return next(
+        field for field in SYNCED_M2M_FIELDS if field.remote_field.through is through
+    )
+
+
+def record_tombstone(instance):
+    Tombstone.objects.create(
+        model=model_label(type(instance)), object_pk=str(instance.pk)
+    )
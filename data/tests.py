@@ -1,7 +1,18 @@
 import json
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
+from authentication.authorization import clear_permission_index_cache, has_perm
+from authentication.serializers import RoleTokenObtainPairSerializer
+
+from .management.commands import run_permission_worker
 from .models import (
     Attendance,
     Batch,
@@ -12,6 +23,8 @@ from .models import (
     IndividualProject,
     MOOCCourse,
     MOOCResult,
+    PermissionGrant,
+    PermissionJob,
     RemedialTestResult,
     StaffDetail,
     StudentDetail,
@@ -21,8 +34,19 @@ from .models import (
     TestResult,
     Weightage,
 )
+from .permissions import (
+    PERMISSION_JOB_MAX_ATTEMPTS,
+    PermissionWriteCollector,
+    coalesce_permission_writes,
+    enqueue_permission_jobs,
+    rebuild_all_permissions,
+    run_permission_job,
+    staff_with_batch_access,
+)
 from .utils import permissions_assign
 
+User = get_user_model()
+
 
 class StaffDetailTestCase(TestCase):
     fixtures = [
@@ -328,6 +352,255 @@ class PermissionAutomationTestCase(TestCase):
             '{"2024-25": {"5": {"DEPT_1": {"B1": {"mooc": {"read": true, "create": true, "delete": true, "update": true}, "project": {"read": true, "create": true, "delete": true, "update": true}, "attendance": {"read": true, "create": true, "delete": true, "update": true}, "test_result": {"read": true, "create": true, "delete": true, "update": true}}, "B2": {"mooc": {"read": true, "create": true, "delete": true, "update": true}, "project": {"read": true, "create": true, "delete": true, "update": true}, "attendance": {"read": true, "create": true, "delete": true, "update": true}, "test_result": {"read": true, "create": true, "delete": true, "update": true}}}}}}',
         )
 
+    def test_permission_grants(self):
+        self.assertEqual(
+            set(PermissionGrant.objects.values_list("staff_id", "batch__name", "role")),
+            {
+                ("staff1@ljku.edu.in", "B1", "FACULTY"),
+                ("staff2@ljku.edu.in", "B2", "FACULTY"),
+                ("staff3@ljku.edu.in", "B1", "HOD"),
+                ("staff3@ljku.edu.in", "B2", "HOD"),
+            },
+        )
+
+        batch_b1 = Batch.objects.get(name="B1")
+        self.assertEqual(
+            set(staff_with_batch_access(batch_b1).values_list("email", flat=True)),
+            {"staff1@ljku.edu.in", "staff3@ljku.edu.in"},
+        )
+
+    def test_rename_department(self):
+        department = Department.objects.all()[0]
+        department.name = "DEPT_2"
+        department.save()
+
+        staff1 = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+        staff3 = StaffDetail.objects.get(email="staff3@ljku.edu.in")
+
+        self.assertEqual(list(staff1.permissions["2024-25"]["5"]), ["DEPT_2"])
+        self.assertEqual(
+            sorted(staff3.permissions["2024-25"]["5"]["DEPT_2"]), ["B1", "B2"]
+        )
+
+    def test_department_updates_run_in_constant_queries(self):
+        def count_queries():
+            department = Department.objects.all()[0]
+            hod = department.hod
+            with CaptureQueriesContext(connection) as queries:
+                department.locked = True
+                department.save()
+                department.locked = False
+                department.save()
+                department.hod = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+                department.save()
+                department.hod = hod
+                department.save()
+            return len(queries)
+
+        count_queries()  # creates the authorization version rows
+        baseline = count_queries()
+
+        department = Department.objects.all()[0]
+        allocations = list(FacultyAllocation.objects.all())
+        for number in range(3, 13):
+            batch = Batch.objects.create(name=f"B{number}")
+            batch.faculty.add(*allocations)
+            department.batch.add(batch)
+
+        self.assertEqual(count_queries(), baseline)
+
+        staff3 = StaffDetail.objects.get(email="staff3@ljku.edu.in")
+        self.assertEqual(len(staff3.permissions["2024-25"]["5"]["DEPT_1"]), 12)
+
+    def test_coalesced_permission_writes(self):
+        department = Department.objects.all()[0]
+        staff1 = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+        allocation2 = FacultyAllocation.objects.get(faculty__email="staff2@ljku.edu.in")
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with coalesce_permission_writes():
+                    batch_b3 = Batch.objects.create(name="B3")
+                    batch_b3.faculty.add(allocation2)
+                    department.batch.add(batch_b3)
+                    Batch.objects.get(name="B1").faculty.add(allocation2)
+                    department.hod = staff1
+                    department.save()
+
+                    staff2 = StaffDetail.objects.get(email="staff2@ljku.edu.in")
+                    self.assertEqual(
+                        list(staff2.permissions["2024-25"]["5"]["DEPT_1"]), ["B2"]
+                    )
+
+        flushes = [
+            callback
+            for callback in callbacks
+            if isinstance(getattr(callback, "__self__", None), PermissionWriteCollector)
+        ]
+        self.assertEqual(len(flushes), 1)
+        staff_updates = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "data_staffdetail"')
+        ]
+        self.assertEqual(len(staff_updates), 1)
+
+        staff1 = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+        staff2 = StaffDetail.objects.get(email="staff2@ljku.edu.in")
+        staff3 = StaffDetail.objects.get(email="staff3@ljku.edu.in")
+
+        self.assertEqual(
+            sorted(staff1.permissions["2024-25"]["5"]["DEPT_1"]), ["B1", "B2", "B3"]
+        )
+        self.assertEqual(
+            staff1.permissions["2024-25"]["5"]["DEPT_1"]["B3"]["attendance"]["delete"],
+            True,
+        )
+        self.assertEqual(
+            sorted(staff2.permissions["2024-25"]["5"]["DEPT_1"]), ["B1", "B2", "B3"]
+        )
+        self.assertEqual(staff3.permissions, {})
+
+    def test_direct_permissions_write(self):
+        clear_permission_index_cache()
+        staff2 = StaffDetail.objects.get(email="staff2@ljku.edu.in")
+        permissions = staff2.permissions
+        scope = ("2024-25", "5", "DEPT_1", "B2")
+        self.assertTrue(has_perm(staff2, scope, "attendance", "read"))
+
+        staff2.permissions = {}
+        staff2.save()
+
+        # the tree is re-derived from the grants over the write
+        self.assertEqual(
+            StaffDetail.objects.get(email="staff2@ljku.edu.in").permissions,
+            permissions,
+        )
+        self.assertTrue(has_perm(staff2, scope, "attendance", "read"))
+
+        PermissionGrant.objects.filter(staff=staff2, batch__name="B2").delete()
+        staff2.permissions = {"stale": True}
+        staff2.save()
+        self.assertFalse(has_perm(staff2, scope, "attendance", "read"))
+
+    def test_failed_permission_flush(self):
+        department = Department.objects.all()[0]
+
+        with mock.patch(
+            "data.permissions.sync_department_grants",
+            side_effect=RuntimeError("boom"),
+        ), self.assertLogs("data.permissions", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                with coalesce_permission_writes():
+                    department.locked = True
+                    department.save()
+
+        # the recompute is left to the worker
+        self.assertEqual(
+            list(PermissionJob.objects.values_list("department_id", flat=True)),
+            [department.pk],
+        )
+
+    def test_rebuild_permissions_command(self):
+        staff1 = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+        expected = staff1.permissions
+
+        # drift introduced behind the signals' back
+        StaffDetail.objects.filter(email="staff1@ljku.edu.in").update(permissions={})
+        PermissionGrant.objects.filter(staff_id="staff2@ljku.edu.in").delete()
+
+        with self.assertNumQueries(5):
+            rebuild_all_permissions()
+
+        out = StringIO()
+        call_command("rebuild_permissions", stdout=out)
+        self.assertIn("staff1@ljku.edu.in: 9 missing, 0 unexpected", out.getvalue())
+        self.assertIn("1 staff drifted, 0 stale and 1 missing grants", out.getvalue())
+        self.assertEqual(
+            StaffDetail.objects.get(email="staff1@ljku.edu.in").permissions, {}
+        )
+
+        call_command("rebuild_permissions", "--apply", stdout=StringIO())
+        self.assertEqual(
+            StaffDetail.objects.get(email="staff1@ljku.edu.in").permissions, expected
+        )
+        self.assertTrue(
+            PermissionGrant.objects.filter(staff_id="staff2@ljku.edu.in").exists()
+        )
+
+        out = StringIO()
+        call_command("rebuild_permissions", stdout=out)
+        self.assertIn("No drift", out.getvalue())
+
+    @override_settings(PERMISSION_JOBS_ASYNC=True)
+    def test_permission_jobs(self):
+        department = Department.objects.all()[0]
+        department.locked = True
+        department.save()
+        department.name = "DEPT_2"
+        department.save()
+
+        # the recompute is queued once and nothing is written yet
+        self.assertEqual(PermissionJob.objects.count(), 1)
+        staff3 = StaffDetail.objects.get(email="staff3@ljku.edu.in")
+        self.assertEqual(
+            sorted(staff3.permissions["2024-25"]["5"]["DEPT_1"]), ["B1", "B2"]
+        )
+
+        out = StringIO()
+        call_command("run_permission_worker", "--once", stdout=out)
+        self.assertIn("Ran 1 permission job(s)", out.getvalue())
+
+        self.assertFalse(PermissionJob.objects.exists())
+        self.assertEqual(
+            StaffDetail.objects.get(email="staff3@ljku.edu.in").permissions, {}
+        )
+
+    @override_settings(PERMISSION_JOBS_ASYNC=True)
+    def test_failed_permission_job(self):
+        PermissionJob.objects.create(department=Department.objects.all()[0])
+
+        with mock.patch(
+            "data.permissions.refresh_department_permissions",
+            side_effect=RuntimeError("boom"),
+        ):
+            self.assertTrue(run_permission_job())
+
+        job = PermissionJob.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.last_error, "boom")
+
+        # the retry waits out the backoff
+        self.assertGreater(job.available_at, job.created_at)
+        self.assertFalse(run_permission_job())
+
+    def test_permission_worker_survives_errors(self):
+        with mock.patch(
+            "data.management.commands.run_permission_worker.run_permission_job",
+            side_effect=[True, RuntimeError("connection lost")],
+        ), mock.patch(
+            "data.management.commands.run_permission_worker.close_old_connections"
+        ) as close_old_connections, self.assertLogs(
+            "data.management.commands.run_permission_worker", "ERROR"
+        ):
+            self.assertEqual(run_permission_worker.Command().drain(once=False), 1)
+        self.assertEqual(close_old_connections.call_count, 2)
+
+    @override_settings(PERMISSION_JOBS_ASYNC=True)
+    def test_requeue_exhausted_permission_job(self):
+        department = Department.objects.all()[0]
+        PermissionJob.objects.create(
+            department=department, attempts=PERMISSION_JOB_MAX_ATTEMPTS
+        )
+        self.assertFalse(run_permission_job())
+
+        enqueue_permission_jobs([department.pk])
+
+        job = PermissionJob.objects.get()
+        self.assertEqual(job.attempts, 0)
+        self.assertTrue(run_permission_job())
+        self.assertFalse(PermissionJob.objects.exists())
+
 
 class PermissionsAssignUtil(TestCase):
     temp = {"a": {"b": 1}}
@@ -457,6 +730,19 @@ class SubjectTestCase(TestCase):
         self.assertEqual(Subject.objects.count(), 2)
         self.assertFalse(Subject.objects.filter(subject_code="26541254").exists())
 
+    def test_subject_list_query_count(self):
+        weightages = list(Weightage.objects.all())
+        for subject in Subject.objects.all():
+            subject.weightage.add(*weightages)
+
+        # subjects and their weightages
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("subject-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(len(response.json()[0]["weightage"]), len(weightages))
+
 
 class StudentDetailTestCase(TestCase):
     fixtures = [
@@ -767,6 +1053,43 @@ class DepartmentTestCase(TestCase):
         self.assertEqual(Department.objects.count(), 0)
         self.assertFalse(Department.objects.filter(name="DEPT_1").exists())
 
+    def test_department_list_query_count(self):
+        StaffDetail.objects.filter(email="staff1@ljku.edu.in").update(admin=True)
+        user = User.objects.create(username="staff1", email="staff1@ljku.edu.in")
+        access = RoleTokenObtainPairSerializer.get_token(user).access_token
+
+        staff = StaffDetail.objects.get(email="staff1@ljku.edu.in")
+        batches = list(Batch.objects.all())
+        branches = list(Branch.objects.all())
+        for number in range(2, 12):
+            department = Department.objects.create(
+                year="2023-24", semester="2", name=f"DEPT_{number}", hod=staff
+            )
+            department.batch.add(*batches)
+            department.branch.add(*branches)
+
+        # departments with their HOD, batches and branches
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("department-list"), HTTP_AUTHORIZATION=f"Bearer {access}"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        departments = {department["name"]: department for department in response.json()}
+        self.assertEqual(len(departments), 11)
+        self.assertEqual(len(departments["DEPT_2"]["batch"]), len(batches))
+        self.assertEqual(len(departments["DEPT_2"]["branch"]), len(branches))
+        self.assertEqual(departments["DEPT_2"]["hod"], "staff1@ljku.edu.in")
+        self.assertEqual(
+            departments["DEPT_2"]["hod_data"],
+            {
+                "email": "staff1@ljku.edu.in",
+                "first_name": staff.first_name,
+                "middle_name": staff.middle_name,
+                "last_name": staff.last_name,
+            },
+        )
+
     def test_add_batch_to_department(self):
         department = Department.objects.get(name="DEPT_1")
 
@@ -0,0 +1,96 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+VERSION_CACHE_KEY = "model-version:{}"
+MODIFIED_CACHE_KEY = "model-modified:{}"
+
+logger = logging.getLogger(__name__)
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def cache_is_shared():
+    """
+    Whether every process serving requests shares the default cache. The
+    counters of a per-process cache such as LocMemCache only see the writes
+    of their own process, so nothing may be served from them. Set
+    CACHE_IS_SHARED to override the guess from the backend.
+    """
+    shared = getattr(settings, "CACHE_IS_SHARED", None)
+    if shared is None:
+        return not isinstance(caches["default"], (LocMemCache, DummyCache))
+    return shared
+
+
+def _bump(labels):
+    for label in labels:
+        key = VERSION_CACHE_KEY.format(label)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+    now = time.time()
+    cache.set_many(
+        {MODIFIED_CACHE_KEY.format(label): now for label in labels}, timeout=None
+    )
+
+
+def _bump_committed(labels):
+    # The rows are committed by now, failing can't undo them
+    try:
+        _bump(labels)
+    except Exception:
+        logger.exception("Could not bump the versions of %s", ", ".join(labels))
+
+
+def bump_model_versions(*models):
+    """
+    Marks the tables of models as changed. The counters are bumped right away
+    and again once the surrounding transaction commits, so a response
+    rendered from the old rows while the transaction was still open is never
+    served under the final version. A failure of the first bump is raised, so
+    the write is rolled back rather than served under a stale version.
+    """
+    labels = {model_label(model) for model in models}
+    _bump(labels)
+    transaction.on_commit(lambda: _bump_committed(sorted(labels)))
+
+
+def get_model_versions(*models):
+    """
+    Returns the version of each model's table and the time the most recent of
+    them changed, in a single cache read. Missing counters, e.g. after an
+    eviction, restart from the current time so they never fall back to a value
+    that was handed out before.
+    """
+    labels = sorted({model_label(model) for model in models})
+    keys = [VERSION_CACHE_KEY.format(label) for label in labels] + [
+        MODIFIED_CACHE_KEY.format(label) for label in labels
+    ]
+    values = cache.get_many(keys)
+
+    missing = [key for key in keys if key not in values]
+    if missing:
+        now = time.time()
+        for key in missing:
+            if key.startswith(VERSION_CACHE_KEY.format("")):
+                initial = time.time_ns()
+            else:
+                initial = now
+            cache.add(key, initial, timeout=None)
+        values.update(cache.get_many(missing))
+
+    versions = {label: values.get(VERSION_CACHE_KEY.format(label)) for label in labels}
+    modified = max(
+        values.get(MODIFIED_CACHE_KEY.format(label)) or 0 for label in labels
+    )
+    return versions, modified